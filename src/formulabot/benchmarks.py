@@ -0,0 +1,355 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import numpy as np
+from formulabot.mep import Population, mse
+from formulabot.dataset import Dataset
+
+
+# the datasets shipped in the data directory
+DATASETS = ['hypotenuse_01', 'hypotenuse_02', 'if_01', 'if_02', 'trigonometry_01']
+
+# the population every benchmark is run on
+CONFIGURATION = {
+    'population_size': 100,
+    'operations_size': 20,
+    'operands_size':   4,
+    'epochs':          200,
+    'crossover_rate':  0.5,
+    'mutation_rate':   0.1,
+    'kill_rate':       0.1,
+}
+
+BENCHMARKS = ['compute', 'update_scores', 'create_child', 'mutate_many', 'kill_many', 'run_epochs']
+
+# the optional dependencies the engine should not load when it is imported
+OPTIONAL_MODULES = ['matplotlib', 'sklearn', 'tqdm', 'jupyterplot']
+
+_IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {optional!r} if m in sys.modules]}}))
+"""
+
+
+def load_dataset(data_dir, name, scale=1):
+    """ Loads a shipped dataset, or a synthetic copy of it scale times as long
+
+    The synthetic copy repeats the rows of the dataset with a little noise on the inputs, so
+    that the scores of the solutions stay comparable to those on the original.
+
+    Args:
+
+        data_dir (str):     The directory of the datasets
+        name (str):         The name of the dataset, without the .csv extension
+        scale (int):        How many times as many rows the copy has. scale >= 1
+    """
+
+    # begin contracts on inputs -----------------------------
+
+    if scale < 1:
+        raise(ValueError)
+
+    # end contracts on inputs -------------------------------
+
+    data = Dataset.from_csv(os.path.join(data_dir, name + '.csv'))
+    if scale == 1:
+        return data
+
+    rng = np.random.default_rng(0)
+    columns = {}
+    for k, v in data.columns.items():
+        column = np.tile(v, scale)
+        if k != data.target:
+            column = column + rng.normal(0., 1e-6 * (np.abs(v).mean() + 1.), len(column))
+        columns[k] = column
+
+    return Dataset(columns, data.target)
+
+
+def build_population(data, seed, **kwargs):
+    """ Creates the population of the benchmarks on the data, with a fixed seed """
+    random.seed(seed)
+    configuration = dict(CONFIGURATION, **kwargs)
+    return Population(parameters=data.parameters, error_calc=mse, inputs=data, **configuration)
+
+
+def best_time(func, repeats):
+    """ Returns the shortest of repeats timings of func, in seconds """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def time_benchmark(data, benchmark, seed=0, repeats=3):
+    """ Times one benchmark on the data
+
+    The evaluations are the number of solutions a benchmark scores on every row of the data.
+    Solution.compute is timed on single rows and counts each row as an evaluation.
+
+    Args:
+
+        data (Dataset):     The data the population is scored on
+        benchmark (str):    One of BENCHMARKS
+        seed (int):         The seed of the random numbers
+        repeats (int):      How many times the benchmark is timed. The best time is kept
+
+    Returns:
+        dict:               The seconds of the best run, the evaluations in it and the
+                            evaluations per second
+    """
+
+    # begin contracts on inputs -----------------------------
+
+    if benchmark not in BENCHMARKS:
+        raise(ValueError)
+
+    if repeats < 1:
+        raise(ValueError)
+
+    # end contracts on inputs -------------------------------
+
+    pop = build_population(data, seed)
+    random.seed(seed)
+
+    if benchmark == 'compute':
+        solution = pop.get_best_solution()
+        rows = [data[x] for x in range(min(len(data), 1000))]
+        inputs = [{p: x[p] for p in pop.parameters} for x in rows]
+
+        def run():
+            for x in inputs:
+                solution.compute(x)
+
+        evaluations = len(inputs)
+
+    elif benchmark == 'update_scores':
+        run = pop.update_scores
+        evaluations = pop.pop_size
+
+    elif benchmark == 'create_child':
+        count = pop.crossovers
+
+        def run():
+            for _ in range(count):
+                pop.create_child()
+
+        evaluations = count
+
+    elif benchmark == 'mutate_many':
+        run = pop.mutate_many
+        evaluations = pop.mutations
+
+    elif benchmark == 'kill_many':
+        run = pop.kill_many
+        evaluations = pop.kills
+
+    else:
+        # a converged population stops early, so only the epochs that ran are counted
+        runs = []
+
+        def run():
+            runs.append(pop.run_epochs(epochs=5, verbose=False))
+
+        evaluations = None
+
+    seconds = best_time(run, repeats)
+    if evaluations is None:
+        evaluations = max(min(runs), 1) * (pop.crossovers + pop.mutations + pop.kills)
+
+    return {'seconds': seconds, 'evaluations': evaluations, 'evals_per_sec': evaluations / seconds}
+
+
+def time_import(module='formulabot.mep', repeats=3):
+    """ Times importing a module in a fresh interpreter and lists the optional dependencies
+        the import loaded
+
+    Returns:
+        dict:   The seconds of the fastest import and the OPTIONAL_MODULES it loaded
+    """
+    script = _IMPORT_SCRIPT.format(module=module, optional=OPTIONAL_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    return min(runs, key=lambda r: r['seconds'])
+
+
+def time_to_target(data, target=0.1, max_epochs=200, seed=0):
+    """ Runs the population one epoch at a time until its best score is at most target
+        times the best score it started with
+
+    Args:
+
+        data (Dataset):     The data the population is scored on
+        target (float):     The fraction of the starting best score to reach. 0 <= target < 1
+        max_epochs (int):   The most epochs to run
+        seed (int):         The seed of the random numbers
+
+    Returns:
+        dict:               The target error, whether it was reached, the epochs run and the
+                            seconds they took
+    """
+
+    # begin contracts on inputs -----------------------------
+
+    if target < 0 or target >= 1:
+        raise(ValueError)
+
+    # end contracts on inputs -------------------------------
+
+    pop = build_population(data, seed, epochs=max_epochs)
+    error = target * pop.get_best_score()
+
+    start = time.perf_counter()
+    while pop.epoch < max_epochs and pop.get_best_score() > error:
+        if pop.run_epochs(epochs=1, verbose=False) == 0:
+            break
+
+    return {'target_error': error, 'reached': bool(pop.get_best_score() <= error),
+            'epochs': pop.epoch, 'seconds': time.perf_counter() - start}
+
+
+def run_suite(data_dir, datasets=None, scales=(1,), benchmarks=None, repeats=3, target=0.1,
+              max_epochs=200, seed=0):
+    """ Runs every benchmark on every dataset at every scale
+
+    Returns:
+        dict:   The results keyed by '<dataset>x<scale>', each a dict of the benchmark results
+                and the 'time_to_target' result, along with the environment they were run in
+    """
+    results = {}
+    for name in datasets or DATASETS:
+        for scale in scales:
+            data = load_dataset(data_dir, name, scale)
+            result = {b: time_benchmark(data, b, seed, repeats) for b in benchmarks or BENCHMARKS}
+            result['time_to_target'] = time_to_target(data, target, max_epochs, seed)
+            results['{}x{}'.format(name, scale)] = result
+
+    return {'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                            'machine': platform.machine(), 'processor': platform.processor()},
+            'import': time_import(repeats=repeats),
+            'results': results}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """ Compares the results of a suite to a baseline and returns the regressions.  The
+        baselines are only meaningful on the machine that recorded them.
+
+    A benchmark regresses when its evaluations per second drop below (1 - tolerance) of the
+    baseline, and the time to target and the import time regress when they take more than
+    (1 + tolerance) times as long, the target is no longer reached or the import loads an
+    optional dependency it did not.
+
+    Args:
+
+        results (dict):     The output of run_suite
+        baseline (dict):    The output of an earlier run_suite
+        tolerance (float):  The fraction a result may be worse than the baseline
+
+    Returns:
+        list<str>:          A description of each regression
+    """
+    regressions = []
+    if 'import' in results and 'import' in baseline:
+        loaded = sorted(set(results['import']['loaded']) - set(baseline['import']['loaded']))
+        if loaded:
+            regressions.append('import: now loads {}'.format(', '.join(loaded)))
+        if results['import']['seconds'] > baseline['import']['seconds'] * (1 + tolerance):
+            regressions.append('import: {:.3f}s vs {:.3f}s'.format(
+                results['import']['seconds'], baseline['import']['seconds']))
+
+    for key, result in results['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+
+        for b, r in result.items():
+            if b not in base:
+                continue
+
+            if b == 'time_to_target':
+                if base[b]['reached'] and not r['reached']:
+                    regressions.append('{} time_to_target: target no longer reached'.format(key))
+                elif base[b]['reached'] and r['seconds'] > base[b]['seconds'] * (1 + tolerance):
+                    regressions.append('{} time_to_target: {:.3f}s vs {:.3f}s'.format(
+                        key, r['seconds'], base[b]['seconds']))
+            elif r['evals_per_sec'] < base[b]['evals_per_sec'] * (1 - tolerance):
+                regressions.append('{} {}: {:.1f} evals/sec vs {:.1f}'.format(
+                    key, b, r['evals_per_sec'], base[b]['evals_per_sec']))
+
+    return regressions
+
+
+def report(results):
+    """ Prints a table of the results """
+    if 'import' in results:
+        print('import formulabot.mep: {:.4f}s, optional dependencies loaded: {}'.format(
+              results['import']['seconds'], ', '.join(results['import']['loaded']) or 'none'))
+
+    print('{:24} {:14} {:>10} {:>14}'.format('dataset', 'benchmark', 'seconds', 'evals/sec'))
+    for key, result in results['results'].items():
+        for b, r in result.items():
+            if b == 'time_to_target':
+                print('{:24} {:14} {:>10.4f} {:>14}'.format(key, 'to target', r['seconds'],
+                      'epoch {}'.format(r['epochs']) if r['reached'] else 'not reached'))
+            else:
+                print('{:24} {:14} {:>10.4f} {:>14.1f}'.format(key, b, r['seconds'], r['evals_per_sec']))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Times the evaluation and evolution of FormulaBot")
+    parser.add_argument('--data-dir', default='data', help="the directory of the shipped datasets")
+    parser.add_argument('--datasets', nargs='+', default=DATASETS, help="the datasets to run on")
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10],
+                        help="the sizes of the synthetic copies of the datasets, as multiples")
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument('--repeats', type=int, default=3, help="how many times each benchmark is timed")
+    parser.add_argument('--target', type=float, default=0.1,
+                        help="the fraction of the starting best score the time to target is measured to")
+    parser.add_argument('--max-epochs', type=int, default=200, help="the most epochs run to reach the target")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', default=None, help="a JSON file to save the results to, as a baseline")
+    parser.add_argument('--baseline', default=None, help="a JSON file of results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="the fraction a result may be worse than the baseline before it is flagged")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.data_dir, args.datasets, args.scales, args.benchmarks, args.repeats,
+                        args.target, args.max_epochs, args.seed)
+    report(results)
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print('REGRESSION', r)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
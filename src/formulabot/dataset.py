@@ -0,0 +1,164 @@
+import os
+import csv
+import json
+import numpy as np
+
+
+class Dataset:
+
+    def __init__(self, columns, target=None, path=None):
+        """ The Dataset holds training or testing data as one contiguous float array per
+            column, which is the form the Population scores solutions on.
+
+        A Dataset loaded with from_csv is memory-mapped from a binary cache of the CSV file,
+        so it loads without parsing the CSV again and is passed to other processes by the
+        path of its cache instead of its data.  It can also be used as a list of dictionaries
+        of the parameters, one per row, like the inputs of Solution.compute.
+
+        Args:
+
+            columns (dict):     A dictionary of equal length arrays keyed by column name
+            target (str):       The name of the column of the results to test the model against.
+                                Defaults to the last column
+            path (str):         The binary cache the columns are mapped from, if any
+        """
+
+        # begin contracts on inputs -----------------------------
+
+        if type(columns) != dict or len(columns) == 0:
+            raise(ValueError)
+
+        if len(set(np.shape(v) for v in columns.values())) != 1:
+            raise(ValueError)
+
+        if target is not None and target not in columns:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        self.columns = {k: np.ascontiguousarray(v, dtype=float) for k, v in columns.items()}
+        self.names = list(columns)
+        self.target = self.names[-1] if target is None else target
+        self.path = path
+
+
+    @classmethod
+    def from_records(cls, inputs, outputs, target='out'):
+        """ Creates a Dataset from a list of dictionaries of the inputs and a list of results
+
+        Args:
+
+            inputs (list<dict>):    A dictionary of the inputs of each row
+            outputs (list):         The result of each row
+            target (str):           The name of the column of the results
+        """
+        names = list(inputs[0]) if len(inputs) else []
+        columns = {k: [x[k] for x in inputs] for k in names}
+        columns[target] = outputs
+        return cls(columns, target)
+
+
+    @classmethod
+    def from_csv(cls, path, target=None, cache_dir=None):
+        """ Loads a CSV file with a header row and numeric columns.  The first load writes a
+            binary cache of the columns, which later loads memory-map while it is newer than
+            the CSV file.
+
+        Args:
+
+            path (str):         The CSV file
+            target (str):       The name of the column of the results. Defaults to the last column
+            cache_dir (str):    The directory of the cache.  Defaults to the directory of the CSV file
+        """
+        base = os.path.basename(path)
+        cache = os.path.join(cache_dir or os.path.dirname(path), base + '.cache')
+
+        if not os.path.exists(cache + '.json') or os.path.getmtime(cache + '.json') < os.path.getmtime(path):
+            cls.write_cache(path, cache)
+
+        return cls.open(cache, target)
+
+
+    @staticmethod
+    def write_cache(path, cache):
+        """ Parses the CSV file and writes its columns to the cache, one row of a float array
+            per column, next to a json file of the column names """
+        with open(path, newline='') as f:
+            names = next(csv.reader(f))
+
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2, dtype=float)
+        if data.shape[1] != len(names):
+            raise(ValueError)
+
+        # written under temporary names so a process never maps a partly written cache
+        array = np.lib.format.open_memmap(cache + '.tmp.npy', mode='w+', dtype=float, shape=data.T.shape)
+        array[:] = data.T
+        array.flush()
+        del array
+
+        with open(cache + '.tmp.json', 'w') as f:
+            json.dump({'names': names}, f)
+
+        os.replace(cache + '.tmp.npy', cache + '.npy')
+        os.replace(cache + '.tmp.json', cache + '.json')
+
+
+    @classmethod
+    def open(cls, cache, target=None):
+        """ Memory-maps a Dataset from the cache written by write_cache """
+        with open(cache + '.json') as f:
+            names = json.load(f)['names']
+
+        array = np.load(cache + '.npy', mmap_mode='r')
+        dataset = cls.__new__(cls)
+        dataset.columns = {k: np.asarray(array[i]) for i, k in enumerate(names)}
+        dataset.names = names
+        dataset.target = names[-1] if target is None else target
+        dataset.path = cache
+
+        if dataset.target not in dataset.columns:
+            raise(ValueError)
+
+        return dataset
+
+
+    def __reduce__(self):
+        # a memory-mapped dataset is mapped again by the process that unpickles it
+        if self.path is not None:
+            return (Dataset.open, (self.path, self.target))
+
+        return (Dataset, (self.columns, self.target))
+
+
+    @property
+    def targets(self):
+        return self.columns[self.target]
+
+
+    @property
+    def parameters(self):
+        return [k for k in self.names if k != self.target]
+
+
+    def get_columns(self, parameters):
+        """ Returns the columns of the given parameters """
+        return {p: self.columns[p] for p in parameters}
+
+
+    def take(self, rows):
+        """ Returns a Dataset of the given rows, in memory """
+        return Dataset({k: v[rows] for k, v in self.columns.items()}, self.target)
+
+
+    def __len__(self):
+        return len(self.columns[self.names[0]])
+
+
+    def __getitem__(self, idx):
+        """ Returns the parameters of a row, without its target """
+        return {k: float(self.columns[k][idx]) for k in self.parameters}
+
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
@@ -0,0 +1,242 @@
+import random
+import multiprocessing
+from formulabot.mep import Population, Solution
+
+
+class Archipelago:
+
+    TOPOLOGIES = ('ring', 'random')
+
+
+    def __init__(self, islands, migration_interval, migrants=1, topology='ring', seed=None, **kwargs):
+        """ The Archipelago evolves several Populations (islands) concurrently, each in its own
+            process, and periodically migrates the best solutions of each island to another.
+
+        Only the genome arrays and scores of the migrating solutions are sent between the
+        processes.
+
+        Args:
+
+            islands (int):              The number of islands. islands >= 1
+            migration_interval (int):   How many epochs the islands run between migrations. >= 1
+            migrants (int):             How many of the best solutions of an island migrate. >= 0
+            topology (str):             'ring' sends the migrants of each island to the next one,
+                                        'random' sends them to a random other island
+            seed (int):                 Seeds the islands and the random topology
+            kwargs:                     The arguments of the Population of each island.  The
+                                        islands are daemon processes, which can not start
+                                        worker processes, so n_jobs must be 1
+        """
+
+        # begin contracts on inputs -----------------------------
+
+        if islands < 1:
+            raise(ValueError)
+
+        if migration_interval < 1:
+            raise(ValueError)
+
+        if migrants < 0:
+            raise(ValueError)
+
+        if topology not in self.TOPOLOGIES:
+            raise(ValueError)
+
+        if kwargs.get('n_jobs', 1) > 1:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migrants = migrants
+        self.topology = topology
+        self.epochs = kwargs['epochs']
+        self.parameters = kwargs['parameters']
+        self.rng = random.Random(seed)
+        self.best = None
+        self.best_score = None
+        self.connections = []
+        self.processes = []
+
+        for _ in range(islands):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_island, daemon=True,
+                                              args=(child, self.rng.randrange(2**32), kwargs))
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        # every island replies once its population is built, or with the error that stopped it
+        try:
+            for connection in self.connections:
+                self._receive(connection)
+        except Exception:
+            for connection, process in zip(self.connections, self.processes):
+                process.terminate()
+                process.join()
+                connection.close()
+            self.connections = []
+            self.processes = []
+            raise
+
+
+    def run_epochs(self, verbose=True):
+        """ Runs the islands for the epochs of their populations, migrating every
+            migration_interval epochs, or until one of them finds an optimal solution
+
+        Returns:
+            int:    The number of epochs that were run
+        """
+        from tqdm import tqdm
+
+        run = 0
+        with tqdm(total=self.epochs, desc="Epochs", disable=not verbose) as pbar:
+            while run < self.epochs:
+                epochs = min(self.migration_interval, self.epochs - run)
+                results = self._request_all(('run', epochs))
+                run += epochs
+                pbar.update(epochs)
+
+                if any(optimal for optimal in results):
+                    if verbose:
+                        print("Optimal Solution Found!")
+                    break
+
+                if run < self.epochs:
+                    self.migrate()
+
+        self._collect_best()
+
+        return run
+
+
+    def migrate(self):
+        """ Sends the best solutions of every island to its destination island, where they
+            replace the worst solutions they score better than """
+        if self.islands < 2 or self.migrants == 0:
+            return
+
+        emigrants = self._request_all(('emigrate', self.migrants))
+        immigrants = [[] for _ in range(self.islands)]
+
+        for i, genomes in enumerate(emigrants):
+            if self.topology == 'ring':
+                destination = (i + 1) % self.islands
+            else:
+                destination = self.rng.choice([x for x in range(self.islands) if x != i])
+
+            immigrants[destination].append(genomes)
+
+        for connection, genomes in zip(self.connections, immigrants):
+            connection.send(('immigrate', genomes))
+
+        for connection in self.connections:
+            self._receive(connection)
+
+
+    def get_best_score(self):
+        return self.best_score
+
+
+    def get_best_solution(self):
+        return self.best
+
+
+    def _collect_best(self):
+        for operators, operand_tables, output_rows, scalings, scores in self._request_all(('emigrate', 1)):
+            if self.best_score is None or scores[0] < self.best_score:
+                self.best = Solution.from_arrays(self.parameters, operators[0], operand_tables[0])
+                self.best.set_output_row(output_rows[0])
+                self.best.set_scaling(scalings[0])
+                self.best_score = scores[0]
+
+
+    def _request_all(self, message):
+        """ sends the message to every island and then waits for all of the replies """
+        for connection in self.connections:
+            connection.send(message)
+
+        return [self._receive(connection) for connection in self.connections]
+
+
+    def _receive(self, connection):
+        """ waits for the reply of an island, raising the error of the island if it failed """
+        reply = connection.recv()
+
+        if isinstance(reply, Exception):
+            raise reply
+
+        return reply
+
+
+    def close(self):
+        for connection, process in zip(self.connections, self.processes):
+            connection.send(('close',))
+            process.join()
+            connection.close()
+
+        self.connections = []
+        self.processes = []
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _island(connection, seed, kwargs):
+    """ runs a Population in an island process, answering the requests of the Archipelago """
+    random.seed(seed)
+
+    try:
+        population = Population(**kwargs)
+    except Exception as e:
+        connection.send(e)
+        connection.close()
+        return
+
+    connection.send(True)
+
+    while True:
+        message = connection.recv()
+
+        try:
+            reply = _handle(population, message)
+        except Exception as e:
+            reply = e
+
+        if message[0] == 'close':
+            connection.close()
+            break
+
+        connection.send(reply)
+
+
+def _handle(population, message):
+    if message[0] == 'run':
+        population.run_epochs(epochs=message[1], verbose=False)
+        return population.is_optimal()
+
+    elif message[0] == 'emigrate':
+        idx = population.get_best_indices(message[1])
+        return (population.operators[idx], population.operand_tables[idx],
+                [population.solutions[x].output_row for x in idx],
+                [population.solutions[x].scaling for x in idx],
+                [population.scores[x] for x in idx])
+
+    elif message[0] == 'immigrate':
+        for operators, operand_tables, output_rows, scalings, scores in message[1]:
+            for k in range(len(operators)):
+                s = Solution.from_arrays(population.parameters, operators[k], operand_tables[k])
+                s.set_output_row(output_rows[k])
+                s.set_scaling(scalings[k])
+                population.accept_child(s, scores[k])
+        return True
+
+    elif message[0] == 'close':
+        population.close()
@@ -1,11 +1,17 @@
+import os
+import time
 import random
 import math
 import copy
-import matplotlib.pyplot as plt
+import pickle
+from collections import OrderedDict
+from collections.abc import Sequence
+import numpy as np
 from enum import Enum
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-from tqdm import tqdm
-from jupyterplot import ProgressPlot
+from formulabot.reporters import get_reporters
+from formulabot.scores import ScoreIndex
+from formulabot.selection import Strategy, SELECTIONS, REPLACEMENTS
+from formulabot.dataset import Dataset
 
 
 class Solution:
@@ -26,12 +32,16 @@ class Solution:
         IF_EQ    = 12
 
 
-    def __init__(self, parameters, operations_size, operands_size):
+    def __init__(self, parameters, operations_size, operands_size, store=None):
         """ The Solution is the encoded representation of a solution that is created by
             the Population class.
 
-        The Solution is comprised of a list of tuples that are computation operations.  Each 
-        tuple in the Solution is comprised of 1. the Operator and 2. a list of operands. 
+        The Solution is comprised of computation operations, one per row.  Each operation is
+        comprised of 1. the Operator and 2. a list of operands.  The first rows are the 
+        parameters.  The operations are stored in two integer arrays, the operators with 
+        shape (rows,) and the operands with shape (rows, operands_size), which may be 
+        views into the genome store of a Population.  The ops property presents them as 
+        a list of (operator, operands) tuples.
 
         Args:
 
@@ -39,6 +49,8 @@ class Solution:
             operations_size (int):      The number of operations that can be performed in the Solution
             operands_size (int):        The number of operands that the operator can perform on through
                                         operation
+            store (tuple):              The (operators, operand_table) arrays to write the solution
+                                        into.  New arrays are allocated when not provided
         """
 
         # begin contracts on inputs -----------------------------
@@ -57,25 +69,284 @@ class Solution:
             
         # end contracts on inputs -------------------------------
 
+        self.parameters = parameters
         self.params_size = len(parameters)
         self.ops_size = len(parameters) + operations_size
-        self.ops = [(p,[]) for p in parameters]
         self.operands_size = operands_size
+
+        if store is None:
+            store = self.allocate(1, self.ops_size, operands_size)
+            store = (store[0][0], store[1][0])
+
+        self.bind(*store)
+        self.operators[:self.params_size] = 0
+        self.operand_table[:self.params_size] = 0
         
         idx = self.params_size
         for _ in range(operations_size):
-            operator = random.randint(1, len(self.Operator))
-            operands = []
-            
-            for _ in range(operands_size):
-                operands.extend([random.randint(0, idx - 1)])
-            
-            self.ops.append((operator, operands))
-        
+            self.operators[idx] = random.randint(1, len(self.Operator))
+            self.operand_table[idx] = [random.randint(0, idx - 1) for _ in range(operands_size)]
             idx = idx + 1
 
+        # the row returned as the result of the solution, and the (offset, slope) it is 
+        # scaled by in linear scaling mode
+        self.output_row = self.ops_size - 1
+        self.scaling = None
+        self.invalidate()
+
+
+    @classmethod
+    def from_arrays(cls, parameters, operators, operand_table):
+        """ Creates a solution that is a view of existing (operators, operand_table) arrays
+
+        Args:
+
+            parameters (list<str>):     A list of the function inputs
+            operators (array):          The operator of each row, shape (rows,)
+            operand_table (array):      The operands of each row, shape (rows, operands_size)
+        """
+        solution = cls.__new__(cls)
+        solution.parameters = parameters
+        solution.params_size = len(parameters)
+        solution.ops_size = len(operators)
+        solution.operands_size = operand_table.shape[1]
+        solution.bind(operators, operand_table)
+        solution.output_row = solution.ops_size - 1
+        solution.scaling = None
+        solution.invalidate()
+        return solution
+
+
+    @staticmethod
+    def allocate(count, ops_size, operands_size):
+        """ Allocates zeroed (operators, operand_table) arrays for count solutions, using the
+            smallest integer types that can hold an Operator and a row index """
+        operators = np.zeros((count, ops_size), dtype=np.int8)
+        operand_table = np.zeros((count, ops_size, operands_size), dtype=np.min_scalar_type(ops_size))
+        return (operators, operand_table)
+
+
+    def bind(self, operators, operand_table):
+        """ Makes the solution a view of the given arrays without changing its caches. 
+            The arrays must hold the same ops as the solution. """
+        self.operators = operators
+        self.operand_table = operand_table
+
+
+    def detach(self):
+        """ Copies the arrays of the solution so it no longer shares them """
+        self.bind(self.operators.copy(), self.operand_table.copy())
+
+
+    def copy(self):
+        """ Returns a copy of the solution with arrays of its own """
+        clone = copy.copy(self)
+        clone.detach()
+        return clone
+
+
+    @property
+    def ops(self):
+        """ The (operator, operands) of every row.  Writing a row or a slice of rows writes
+            them into the arrays of the solution """
+        return _Ops(self)
+
+
+    @ops.setter
+    def ops(self, ops):
+
+        # begin contracts on inputs -----------------------------
+
+        if len(ops) != self.ops_size:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        self.parameters = [op[0] for op in ops[:self.params_size]]
+
+        for i, op in enumerate(ops[self.params_size:], start=self.params_size):
+            self.operators[i] = op[0]
+            self.operand_table[i] = op[1]
+
+        self.invalidate()
+
+
+    def snapshot(self):
+        """ Returns a copy of the genome, output row and scaling of the solution that 
+            restore can return it to """
+        return (self.operators.copy(), self.operand_table.copy(), self.output_row, self.scaling)
+
+
+    def restore(self, snapshot):
+        """ Returns the solution to a snapshot, writing the genome back into its arrays """
+        operators, operand_table, self.output_row, self.scaling = snapshot
+        self.operators[:] = operators
+        self.operand_table[:] = operand_table
+        self.invalidate()
+
+
+    def row(self, i):
+        """ Returns the operation in the given row as an (operator, operands) tuple """
+        if i < self.params_size:
+            return (self.parameters[i], [])
+
+        return (int(self.operators[i]), self.operand_table[i].tolist())
+
+
+    def invalidate(self):
+        """ Discards everything cached from the current ops.  Must be called after
+            the operator or operand arrays are modified directly. """
+        self._compiled = None
+        self._simplified = None
+        self._refs = None
+        self._tape = None
+        self._tape_columns = None
+
+
+    def __getstate__(self):
+        # compiled functions can not be pickled and tapes are too large to copy
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+        state['_simplified'] = None
+        state['_tape'] = None
+        state['_tape_columns'] = None
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_simplified', None)
+        self.__dict__.setdefault('scaling', None)
+        if self._refs is not None:
+            self._refs = list(self._refs)
+
+
+    def replace_row(self, row, op):
+        """ Replaces a single operation row, updating the cached effective rows
+            incrementally instead of discarding them.
+
+        Args:
+
+            row (int):      The index of the operation row to replace
+            op (tuple):     The new (operator, operands) tuple for the row
+        """
+        old = self.operands(row)
+        self.operators[row] = op[0]
+        self.operand_table[row] = op[1]
+        self._compiled = None
+        self._simplified = None
+
+        if self._tape is not None:
+            self._discard_tape_rows(row)
+
+        # a dead row can not change which rows are live
+        if self._refs is None or self._refs[row] == 0:
+            return
+
+        self._retain(self.operands(row))
+        self._release(old)
+
 
-    def compute(self, values):
+    def _discard_tape_rows(self, row):
+        """ discards the stored values of the row and every row that depends on it """
+        dirty = {row}
+        self._tape = list(self._tape)
+        self._tape[row] = None
+
+        for i in range(row + 1, self.ops_size):
+            if self._tape[i] is not None and not dirty.isdisjoint(self.operands(i)):
+                dirty.add(i)
+                self._tape[i] = None
+
+
+    def set_scaling(self, scaling):
+        """ Sets the (offset, slope) the output row is scaled by, or None to return the
+            output row as it is """
+        self.scaling = None if scaling is None else (float(scaling[0]), float(scaling[1]))
+        self._compiled = None
+        self._simplified = None
+
+
+    def set_output_row(self, row):
+        """ Selects which row of the tape is returned as the result of the solution """
+        if row == self.output_row:
+            return
+
+        old = self.output_row
+        self.output_row = row
+        self._compiled = None
+        self._simplified = None
+
+        if self._refs is not None:
+            self._retain([row])
+            self._release([old])
+
+
+    def operands(self, row):
+        """ Returns the rows actually read by the operator in the given row """
+        if row < self.params_size:
+            return []
+
+        return self.operand_table[row, :_ARITY[self.operators[row]]].tolist()
+
+
+    def _count_refs(self):
+        """ counts how many live rows (or the output) reference each row """
+        refs = [0] * self.ops_size
+        refs[self.output_row] = 1
+
+        for i in range(self.output_row, self.params_size - 1, -1):
+            if refs[i] > 0:
+                for x in self.operands(i):
+                    refs[x] += 1
+
+        return refs
+
+
+    def _retain(self, rows):
+        stack = list(rows)
+        while stack:
+            x = stack.pop()
+            self._refs[x] += 1
+            if self._refs[x] == 1:
+                stack.extend(self.operands(x))
+
+
+    def _release(self, rows):
+        stack = list(rows)
+        while stack:
+            x = stack.pop()
+            self._refs[x] -= 1
+            if self._refs[x] == 0:
+                stack.extend(self.operands(x))
+
+
+    def effective_rows(self):
+        """ Returns the sorted indices of the rows that contribute to the output.
+            Every other row is an intron and is skipped when evaluating, rendering
+            and hashing the solution. """
+        if self._refs is None:
+            self._refs = self._count_refs()
+
+        return [i for i, r in enumerate(self._refs) if r > 0]
+
+
+    def effective_program(self):
+        """ Returns the effective rows as a canonical tuple, with the rows renumbered
+            by their position in the effective program.  Solutions that compute the
+            same thing the same way have the same effective program regardless of
+            their introns. """
+        rows = self.effective_rows()
+        position = {x: i for i, x in enumerate(rows)}
+
+        return tuple((self.row(x)[0], tuple(position[y] for y in self.operands(x))) for x in rows)
+
+
+    def effective_hash(self):
+        return hash(self.effective_program())
+
+
+    def compute(self, values, simplify=False):
         """ Computes the result from the solution with the provided inputs
 
         Args:
@@ -84,6 +355,7 @@ class Solution:
                             and the values as the inputs into the model
 
                             ex.  values = {'X':100, 'Y', 200}
+            simplify (bool):    Compute the simplified program of the solution
         """
 
         # begin contracts on inputs -----------------------------
@@ -95,57 +367,137 @@ class Solution:
             raise(ValueError)
 
         # end contracts on inputs -------------------------------
+
+        if simplify:
+            return(self.simplified().compile()(values))
         
-        # reset calc tape
-        calc_tape = [None] * self.ops_size
+        return(self.compile()(values))
+
 
-        for i, _ in enumerate(self.ops):
+    def to_python_source(self):
+        """ Generates straight-line python source for the solution
+
+        Every row of the tape becomes a local variable assignment with the operand
+        rows resolved ahead of time, so calling the generated function performs no
+        Operator or ops lookups.
+        """
+        lines = ['def solution(values):']
+
+        for i in self.effective_rows():
+            op = self.row(i)
 
             # handle terminals
-            if len(self.ops[i][1]) == 0:
-                calc_tape[i] = values[self.ops[i][0]]
+            if len(op[1]) == 0:
+                lines.append(f'    r{i} = values[{op[0]!r}]')
 
             # handle operations
             else:
-                if self.Operator(self.ops[i][0]).name == 'ADD':
-                    calc_tape[i] = calc_tape[self.ops[i][1][0]] + calc_tape[self.ops[i][1][1]]
-                elif self.Operator(self.ops[i][0]).name == 'MINUS':
-                    calc_tape[i] = calc_tape[self.ops[i][1][0]] - calc_tape[self.ops[i][1][1]]
-                elif self.Operator(self.ops[i][0]).name == 'MULTIPLY':
-                    calc_tape[i] = calc_tape[self.ops[i][1][0]] * calc_tape[self.ops[i][1][1]]
-                elif self.Operator(self.ops[i][0]).name == 'DIVIDE':
-                    try:
-                        calc_tape[i] = calc_tape[self.ops[i][1][0]] / calc_tape[self.ops[i][1][1]]
-                    except ZeroDivisionError:
-                        calc_tape[i] = 0.
-                elif self.Operator(self.ops[i][0]).name == 'ABS_SQRT':
-                    calc_tape[i] = math.sqrt(abs(calc_tape[self.ops[i][1][0]]))        
-                elif self.Operator(self.ops[i][0]).name == 'NEG':
-                    calc_tape[i] = -1. * calc_tape[self.ops[i][1][0]]   
-                elif self.Operator(self.ops[i][0]).name == 'SIN':
-                    calc_tape[i] = math.sin(calc_tape[self.ops[i][1][0]])        
-                elif self.Operator(self.ops[i][0]).name == 'COS':
-                    calc_tape[i] = math.cos(calc_tape[self.ops[i][1][0]])        
-                elif self.Operator(self.ops[i][0]).name == 'TAN':
-                    calc_tape[i] = math.tan(calc_tape[self.ops[i][1][0]])
-                elif self.Operator(self.ops[i][0]).name == 'IF_GT':
-                    if calc_tape[self.ops[i][1][0]] > calc_tape[self.ops[i][1][1]]:
-                        calc_tape[i] = calc_tape[self.ops[i][1][2]]
-                    else:
-                        calc_tape[i] = calc_tape[self.ops[i][1][3]]
-                elif self.Operator(self.ops[i][0]).name == 'IF_LT':
-                    if calc_tape[self.ops[i][1][0]] < calc_tape[self.ops[i][1][1]]:
-                        calc_tape[i] = calc_tape[self.ops[i][1][2]]
-                    else:
-                        calc_tape[i] = calc_tape[self.ops[i][1][3]]
-                elif self.Operator(self.ops[i][0]).name == 'IF_EQ':
-                    if calc_tape[self.ops[i][1][0]] == calc_tape[self.ops[i][1][1]]:
-                        calc_tape[i] = calc_tape[self.ops[i][1][2]]
-                    else:
-                        calc_tape[i] = calc_tape[self.ops[i][1][3]]
-
-        # return the value in the last row of the calc tape
-        return(calc_tape[i])
+                operands = [f'r{x}' for x in op[1][:4]]
+                lines.append(f'    r{i} = ' + _SCALAR_TEMPLATES[op[0]].format(*operands))
+
+        # return the value in the output row of the calc tape
+        if self.scaling is None:
+            lines.append(f'    return r{self.output_row}')
+        else:
+            lines.append(f'    return {self.scaling[0]!r} + {self.scaling[1]!r} * r{self.output_row}')
+
+        return '\n'.join(lines)
+
+
+    def compile(self):
+        """ Returns the solution compiled to a python function of the input values.
+            The function is cached until the ops are changed. """
+        if self._compiled is None:
+            namespace = dict(_SCALAR_NAMESPACE)
+            exec(self.to_python_source(), namespace)
+            self._compiled = namespace['solution']
+
+        return self._compiled
+
+
+    def compute_batch(self, columns):
+        """ Computes the results from the solution for an entire dataset at once
+
+        Each row of the solution is evaluated as a single vectorized operation over
+        all of the samples, so the cost of interpreting the tape is paid once per
+        dataset instead of once per sample.
+
+        Args:
+
+            columns (dict):  A dictionary with keys representing the variable names
+                             and the values as equal length arrays of inputs
+
+                             ex.  columns = {'X':[100, 50], 'Y':[200, 10]}
+
+        Returns:
+
+            numpy.ndarray:   The prediction for every sample
+        """
+
+        # begin contracts on inputs -----------------------------
+        
+        if type(columns) != dict:
+            raise(ValueError)
+        
+        if len(columns) != self.params_size:
+            raise(ValueError)
+
+        if len(set(np.shape(v) for v in columns.values())) != 1:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        calc_tape = self.compute_tape(columns, self.effective_rows())
+
+        # return the values in the output row of the calc tape
+        return(self.scale(calc_tape[self.output_row]))
+
+
+    def scale(self, pred):
+        """ Returns the values of the output row scaled by the scaling of the solution """
+        if self.scaling is None:
+            return pred
+
+        with np.errstate(all='ignore'):
+            return self.scaling[0] + self.scaling[1] * pred
+
+
+    def compute_tape(self, columns, rows=None, reuse=None):
+        """ Computes the vectorized calc tape of the solution
+
+        Args:
+
+            columns (dict):  A dictionary with keys representing the variable names
+                             and the values as equal length arrays of inputs
+            rows (list):     The ascending rows to compute.  Every operand of these 
+                             rows must be included.  Defaults to every row.
+            reuse (list):    A previously computed tape for the same columns.  Rows
+                             that are not None in it are reused instead of computed.
+
+        Returns:
+
+            list:            The values of each computed row, None for the others
+        """
+        if rows is None:
+            rows = range(self.ops_size)
+
+        calc_tape = [None] * self.ops_size if reuse is None else list(reuse)
+
+        with np.errstate(all='ignore'):
+            for i in rows:
+                if calc_tape[i] is not None:
+                    continue
+
+                # handle terminals
+                if i < self.params_size:
+                    calc_tape[i] = np.asarray(columns[self.parameters[i]], dtype=float)
+
+                # handle operations
+                else:
+                    operands = [calc_tape[x] for x in self.operands(i)]
+                    calc_tape[i] = _VECTOR_FUNCS[int(self.operators[i])](*operands)
+
+        return(calc_tape)
 
 
     def print_solution_diagnostics(self):
@@ -155,17 +507,22 @@ class Solution:
         for idx, x in enumerate(self.ops[:self.params_size]):
             print(f'{idx:4d}. {x[0]:10}')
         print('--------------------------------------------------------------------')
+        live = set(self.effective_rows())
         for idx, x in enumerate(self.ops[self.params_size:], start=self.params_size):
-            print(f'{idx:4d}. {self.Operator(x[0]).name:10} {x[1]}') 
+            print(f'{idx:4d}.{"*" if idx in live else " "}{self.Operator(x[0]).name:10} {x[1]}') 
         print('--------------------------------------------------------------------')
         print("LaTex: ", self.to_latex_string())
         print('--------------------------------------------------------------------')
 
 
-    def to_latex_string(self):
+    def to_latex_string(self, simplify=False):
+        if simplify:
+            return self.simplified().to_latex_string()
+
         formulas = [None]*self.ops_size
 
-        for i, op in enumerate(self.ops):
+        for i in self.effective_rows():
+            op = self.row(i)
             if len(op[1]) > 1:
                 if self.Operator(op[0]).name == "ADD":
                     formulas[i] = r"(" + str(formulas[op[1][0]]) + "+" + str(formulas[op[1][1]]) + ")"
@@ -195,14 +552,16 @@ class Solution:
             else:
                 formulas[i] = str(op[0])
 
-        return formulas[-1]
+        if self.scaling is not None:
+            return r"(" + f"{self.scaling[1]:.6g}" + r"\cdot " + str(formulas[self.output_row]) + f"{self.scaling[0]:+.6g}" + ")"
+
+        return formulas[self.output_row]
 
 
     def mutate(self):
         
         row = random.randint(self.params_size, self.ops_size-1)    
-        new_operands = copy.deepcopy(self.ops[row][1])
-        new_operator = self.ops[row][0]
+        new_operator, new_operands = self.row(row)
 
         action = random.randint(0,2)
 
@@ -219,9 +578,94 @@ class Solution:
         if action == 2:
             new_operator = random.randint(1, len(self.Operator))
             
-        self.ops[row] = (new_operator, new_operands)
+        self.replace_row(row, (new_operator, new_operands))
 
     
+    def crossover(self, other, splice):
+        """ Replaces the rows before splice with the rows of another solution """
+        self.operators[:splice] = other.operators[:splice]
+        self.operand_table[:splice] = other.operand_table[:splice]
+        self.invalidate()
+
+
+    @classmethod
+    def offspring(cls, parent, other, splice, store=None):
+        """ Creates the child of a crossover without copying either parent.  The rows
+            before splice are written from other and the remaining rows from parent 
+            straight into the arrays of the child.
+
+        Args:
+
+            parent (Solution):      The solution the child takes its last rows from
+            other (Solution):       The solution the child takes the rows before splice from
+            splice (int):           The first row taken from parent
+            store (tuple):          The (operators, operand_table) arrays to write the child
+                                    into.  New arrays are allocated when not provided
+        """
+        if store is None:
+            store = cls.allocate(1, parent.ops_size, parent.operands_size)
+            store = (store[0][0], store[1][0])
+
+        operators, operand_table = store
+        operators[:splice] = other.operators[:splice]
+        operators[splice:] = parent.operators[splice:]
+        operand_table[:splice] = other.operand_table[:splice]
+        operand_table[splice:] = parent.operand_table[splice:]
+
+        child = cls.from_arrays(parent.parameters, operators, operand_table)
+        child.output_row = parent.output_row
+        return child
+
+
+    def simplify(self):
+        """ Rewrites the effective program of the solution in place into an equivalent
+            program with fewer rows, when there is one.
+
+        Double negations are removed, negations are absorbed by the operators around them,
+        rows that compute the same thing are merged, rows whose operands are constants are
+        folded and conditionals whose condition is the same every time, or whose branches
+        are the same, are replaced by their branch.  The program only depends on the
+        identities x - x = 0, 0 * x = 0 and (x == x) holding, so it computes the same 
+        result wherever the rows of the original program are finite.
+
+        The simplified program is written to the last rows of the solution and becomes
+        its output, and the rows before it are kept as introns.
+
+        Returns:
+            bool:   Whether the solution was rewritten
+        """
+        program, output = _simplify_program(self)
+        rows = [i for i in self.effective_rows() if i >= self.params_size]
+
+        # a program that simplifies to an input is written as the conditional (x == x) ? x : x
+        # so that its output is still a row that mutations can reach
+        if output < self.params_size:
+            program = [(self.Operator.IF_EQ.value, [output] * 4)]
+
+        if len(program) >= len(rows):
+            return False
+
+        base = self.ops_size - len(program)
+        for k, (operator, operands) in enumerate(program):
+            self.operators[base + k] = operator
+            self.operand_table[base + k, :len(operands)] = operands
+
+        self.output_row = self.ops_size - 1
+        self.invalidate()
+        return True
+
+
+    def simplified(self):
+        """ Returns a simplified copy of the solution, which is kept until the ops change """
+        if self._simplified is None:
+            clone = self.copy()
+            clone.invalidate()
+            clone.simplify()
+            self._simplified = clone
+
+        return self._simplified
+
+
     def compare_operations(self, s):
         for a, b in zip(self.ops, s.ops):
             if a != b:
@@ -229,10 +673,358 @@ class Solution:
 
         return True
 
+
+class _Ops(Sequence):
+    """ The rows of a solution as a list of (operator, operands) tuples that reads from and
+        writes to the arrays of the solution """
+
+    def __init__(self, solution):
+        self.solution = solution
+
+
+    def __len__(self):
+        return self.solution.ops_size
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.solution.row(j) for j in range(*i.indices(len(self)))]
+
+        return self.solution.row(self.row(i))
+
+
+    def __setitem__(self, i, op):
+        if isinstance(i, slice):
+            rows = range(*i.indices(len(self)))
+            ops = list(op)
+        else:
+            rows = [self.row(i)]
+            ops = [op]
+
+        # begin contracts on inputs -----------------------------
+
+        if len(ops) != len(rows):
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        solution = self.solution
+        for row, (operator, operands) in zip(rows, ops):
+            if row < solution.params_size:
+                solution.parameters = list(solution.parameters)
+                solution.parameters[row] = operator
+            else:
+                solution.operators[row] = operator
+                solution.operand_table[row] = operands
+
+        solution.invalidate()
+
+
+    def row(self, i):
+        """ Returns the row of the index i, which may count from the end """
+        row = i + len(self) if i < 0 else i
+        if row < 0 or row >= len(self):
+            raise(IndexError)
+
+        return row
+
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+
+    def __repr__(self):
+        return repr(list(self))
+
+def _protected_divide(a, b):
+    """ element-wise a / b where division by zero results in 0. """
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=(b != 0))
+
+
+# vectorized implementations of each Operator, keyed by the Operator value.  Each 
+# takes the arrays of its operand rows.
+_VECTOR_FUNCS = {
+    Solution.Operator.ADD.value:      lambda a, b: a + b,
+    Solution.Operator.MINUS.value:    lambda a, b: a - b,
+    Solution.Operator.MULTIPLY.value: lambda a, b: a * b,
+    Solution.Operator.DIVIDE.value:   _protected_divide,
+    Solution.Operator.ABS_SQRT.value: lambda a: np.sqrt(np.abs(a)),
+    Solution.Operator.NEG.value:      lambda a: -1. * a,
+    Solution.Operator.SIN.value:      np.sin,
+    Solution.Operator.COS.value:      np.cos,
+    Solution.Operator.TAN.value:      np.tan,
+    Solution.Operator.IF_GT.value:    lambda a, b, c, d: np.where(a > b, c, d),
+    Solution.Operator.IF_LT.value:    lambda a, b, c, d: np.where(a < b, c, d),
+    Solution.Operator.IF_EQ.value:    lambda a, b, c, d: np.where(a == b, c, d),
+}
+
+
+# the number of operands read by each Operator, keyed by the Operator value
+_ARITY = {
+    Solution.Operator.ADD.value:      2,
+    Solution.Operator.MINUS.value:    2,
+    Solution.Operator.MULTIPLY.value: 2,
+    Solution.Operator.DIVIDE.value:   2,
+    Solution.Operator.ABS_SQRT.value: 1,
+    Solution.Operator.NEG.value:      1,
+    Solution.Operator.SIN.value:      1,
+    Solution.Operator.COS.value:      1,
+    Solution.Operator.TAN.value:      1,
+    Solution.Operator.IF_GT.value:    4,
+    Solution.Operator.IF_LT.value:    4,
+    Solution.Operator.IF_EQ.value:    4,
+}
+
+# python expression templates for each Operator, keyed by the Operator value.  
+# {0}..{3} are replaced with the local variables holding the operand rows.
+_SCALAR_TEMPLATES = {
+    Solution.Operator.ADD.value:      '{0} + {1}',
+    Solution.Operator.MINUS.value:    '{0} - {1}',
+    Solution.Operator.MULTIPLY.value: '{0} * {1}',
+    Solution.Operator.DIVIDE.value:   '{0} / {1} if {1} != 0 else 0.',
+    Solution.Operator.ABS_SQRT.value: '_sqrt(abs({0}))',
+    Solution.Operator.NEG.value:      '-1. * {0}',
+    Solution.Operator.SIN.value:      '_sin({0})',
+    Solution.Operator.COS.value:      '_cos({0})',
+    Solution.Operator.TAN.value:      '_tan({0})',
+    Solution.Operator.IF_GT.value:    '{2} if {0} > {1} else {3}',
+    Solution.Operator.IF_LT.value:    '{2} if {0} < {1} else {3}',
+    Solution.Operator.IF_EQ.value:    '{2} if {0} == {1} else {3}',
+}
+
+_SCALAR_NAMESPACE = {'_sqrt': math.sqrt, '_sin': math.sin, '_cos': math.cos, '_tan': math.tan}
+
+
+def _linear_fit(pred, targets):
+    """ Returns the least squares offsets a and slopes b that scale each row of pred to the
+        targets as a + b * pred.  A row that is the same for every sample gets the slope 0, 
+        and a row that is not finite gets a scaling that is not finite. """
+    with np.errstate(all='ignore'):
+        mean = np.mean(pred, axis=-1)
+        deviations = pred - mean[..., None]
+        variance = np.sum(deviations * deviations, axis=-1)
+        covariance = deviations @ (targets - np.mean(targets))
+        slope = np.where(variance > 0, covariance / np.where(variance > 0, variance, 1.), 0.)
+        return (np.mean(targets) - slope * mean, slope)
+
+
+def _simplify_program(solution):
+    """ Rewrites the effective program of a solution as the operator rows of a smaller,
+        equivalent program, numbered to follow on from the last row of the solution.
+
+    The rows are rewritten in order into a graph of distinct expressions, so rows that
+    compute the same expression become one node.  A node of constant operands is folded to
+    its value, which is kept with the node and only written as rows when it is used.
+
+    Returns:
+        tuple:  The (operator, operands) of each row of the program, and the row of its
+                output, which is a parameter row when the program simplifies to an input
+    """
+    O = Solution.Operator
+    params_size = solution.params_size
+    nodes = [(None, ())] * params_size
+    values = [None] * params_size
+    index = {}
+
+    def node(operator, args, value=None):
+        key = (operator, args)
+        if key not in index:
+            index[key] = len(nodes)
+            nodes.append(key)
+            values.append(value)
+
+        return index[key]
+
+    def zero():
+        return node(O.MINUS.value, (0, 0), 0.)
+
+    def one():
+        return node(O.COS.value, (zero(),), 1.)
+
+    def negated(a):
+        return nodes[a][1][0] if nodes[a][0] == O.NEG.value else None
+
+    def rewrite(operator, args):
+        known = [values[a] for a in args]
+
+        if None not in known:
+            with np.errstate(all='ignore'):
+                value = float(_VECTOR_FUNCS[operator](*[np.array([v]) for v in known])[0])
+            if value == 0.:
+                return zero()
+            if value == 1.:
+                return one()
+            return node(operator, args, value)
+
+        if operator == O.NEG.value and negated(args[0]) is not None:
+            return negated(args[0])
+
+        if operator in (O.ABS_SQRT.value, O.COS.value) and negated(args[0]) is not None:
+            return rewrite(operator, (negated(args[0]),))
+
+        if operator == O.ADD.value:
+            a, b = args
+            if known[0] == 0.:
+                return b
+            if known[1] == 0.:
+                return a
+            if negated(b) is not None:
+                return rewrite(O.MINUS.value, (a, negated(b)))
+            if negated(a) is not None:
+                return rewrite(O.MINUS.value, (b, negated(a)))
+            args = tuple(sorted(args))
+
+        if operator == O.MINUS.value:
+            a, b = args
+            if a == b:
+                return zero()
+            if known[1] == 0.:
+                return a
+            if known[0] == 0.:
+                return rewrite(O.NEG.value, (b,))
+            if negated(b) is not None:
+                return rewrite(O.ADD.value, (a, negated(b)))
+
+        if operator == O.MULTIPLY.value:
+            a, b = args
+            if known[0] == 0. or known[1] == 0.:
+                return zero()
+            if known[0] == 1.:
+                return b
+            if known[1] == 1.:
+                return a
+            if negated(a) is not None and negated(b) is not None:
+                return rewrite(operator, (negated(a), negated(b)))
+            args = tuple(sorted(args))
+
+        if operator == O.DIVIDE.value:
+            a, b = args
+            if known[0] == 0. or known[1] == 0.:
+                return zero()
+            if known[1] == 1.:
+                return a
+            if negated(a) is not None and negated(b) is not None:
+                return rewrite(operator, (negated(a), negated(b)))
+
+        if operator in (O.IF_GT.value, O.IF_LT.value, O.IF_EQ.value):
+            a, b, then, otherwise = args
+            if then == otherwise:
+                return then
+            if a == b:
+                return then if operator == O.IF_EQ.value else otherwise
+            if known[0] is not None and known[1] is not None:
+                taken = _VECTOR_FUNCS[operator](np.array([known[0]]), np.array([known[1]]), 1., 0.)
+                return then if taken[0] else otherwise
+
+        return node(operator, args)
+
+    rows = {}
+    for i in solution.effective_rows():
+        if i < params_size:
+            rows[i] = i
+        else:
+            rows[i] = rewrite(int(solution.operators[i]), tuple(rows[x] for x in solution.operands(i)))
+
+    output = rows[solution.output_row]
+
+    # the nodes are created after their operands, so the reachable nodes in the order 
+    # they were created are a valid program
+    reachable = set()
+    stack = [output]
+    while stack:
+        x = stack.pop()
+        if x not in reachable:
+            reachable.add(x)
+            stack.extend(nodes[x][1])
+
+    order = sorted(x for x in reachable if x >= params_size)
+    base = solution.ops_size - len(order)
+    position = {x: base + k for k, x in enumerate(order)}
+    position.update((x, x) for x in range(params_size))
+
+    program = [(nodes[x][0], [position[a] for a in nodes[x][1]]) for x in order]
+    return (program, position[output])
+
+class ErrorMetric:
+
+    def __init__(self, loss):
+        """ An error calculation that is the mean of an element-wise loss of the residuals.
+
+        It is called like the sklearn metrics, error_metric(y_true, y_pred), but without
+        their input validation.  Because the error is a sum over the samples, a Population
+        can score a batch of predictions in one reduction and stop scoring a solution part
+        way through the samples once its error is known to be too large.
+
+        Args:
+
+            loss (ufunc):   The element-wise loss of the residuals
+        """
+        self.loss = loss
+
+
+    def __call__(self, y_true, y_pred):
+        residuals = np.subtract(y_pred, y_true, dtype=float)
+        return float(np.mean(self.loss(residuals, out=residuals)))
+
+
+mse = ErrorMetric(np.square)
+mae = ErrorMetric(np.abs)
+
+# the sklearn metrics that have a native equivalent, by name so that sklearn is not
+# imported to recognize them
+_LOSSES = {
+    'mean_squared_error':  np.square,
+    'mean_absolute_error': np.abs,
+}
+
+
+def _rate(count, total):
+    return count / total if total else 0.
+
+
+def _loss_of(error_calc):
+    """ Returns the element-wise loss of the error calculation, or None if it is not 
+        the mean of a loss of the residuals """
+    if isinstance(error_calc, ErrorMetric):
+        return error_calc.loss
+
+    if not getattr(error_calc, '__module__', None) or not error_calc.__module__.startswith('sklearn.metrics'):
+        return None
+
+    return _LOSSES.get(getattr(error_calc, '__name__', None))
+
+# the number of bytes of calc tape the population evaluation works on at once
+_BATCH_MEMORY = 2**24
+
+# above this many samples the row operations of a single solution are large enough that
+# evaluating solutions one at a time is faster than gathering them into batches
+_BATCH_SAMPLES = 256
+
+# the fewest samples scored at once when the scoring of a solution can stop early
+_BOUND_CHUNK = 1024
+
+# how many times more samples each stage of a race has scored than the one before
+_RACE_GROWTH = 4
+
+# the quantile of the population scores a candidate must stay below to survive a race
+_RACE_QUANTILE = 0.5
+
+
 class Population:
     
     def __init__(self, population_size, parameters, operations_size, operands_size, 
-                 epochs, crossover_rate, mutation_rate, kill_rate, error_calc, inputs, outputs):
+                 epochs, crossover_rate, mutation_rate, kill_rate, error_calc, inputs, outputs=None,
+                 multi_expression=False, cache_size=0, tape_memory=0, n_jobs=1,
+                 selection='random', replacement='worst', racing=0., profile=False,
+                 linear_scaling=False, checkpoint=None):
         """ The Population is the collection of Solution objects.  Operations against the Solutions
             are performed through the Population class
 
@@ -251,12 +1043,47 @@ class Population:
             mutation_rate (float):      A percentage of the solutions to mutate in each epoch
             kill_rate (float):          A percentage of the solutions to kill in each epoch. A new 
                                         solution will replace the dead Solution
-            error_calc (func):          The method of error calculation to perform
+            error_calc (func):          The method of error calculation to perform, called as
+                                        error_calc(y_true, y_pred).  The native mse and mae 
+                                        metrics, and the sklearn metrics they replace, are 
+                                        computed without calling it
             inputs (list<dict>):        A list of dictionaries representing the model inputs for training
-                                        and testing
-            outputs (list):             A list of results to test the model against
+                                        and testing, or a Dataset
+            outputs (list):             A list of results to test the model against.  Defaults to the 
+                                        target column when inputs is a Dataset
+            multi_expression (bool):    Score every operation row of a solution as a candidate
+                                        output and use the best one as the solution's result
+            cache_size (int):           The number of scores to remember by the effective program
+                                        of the solution.  0 disables the cache
+            tape_memory (int):          The number of bytes used to keep the calc tapes of recently
+                                        evaluated solutions so only the rows changed by a mutation
+                                        or crossover are recomputed.  0 disables keeping tapes
+            n_jobs (int):               The number of worker processes used to score batches of 
+                                        solutions.  The error_calc must be picklable when > 1
+            selection (str|Selection):  How the parents of the children are chosen. One of 'random',
+                                        'tournament' or 'proportional', or a Selection instance
+            replacement (str|Replacement):  Which solution a child replaces. One of 'worst',
+                                        'random_worse' or 'crowding', or a Replacement instance
+            racing (float):             The fraction of the training data that children and
+                                        mutants are first scored on.  Only those that score 
+                                        better than the median solution on it are scored on
+                                        more random samples and finally all of the data. The
+                                        other children are rejected and the other mutants are
+                                        reverted.  0 disables racing
+            profile (bool):             Record the metrics of every epoch in metrics, as
+                                        observers added with add_observer receive them
+            linear_scaling (bool):      Score each solution on its output scaled by the least 
+                                        squares a + b * output, and keep (a, b) with the 
+                                        solution so its predictions and formula include them.
+                                        Scoring is not cut short by racing or bounds then
+            checkpoint (str):           A file saved by save_checkpoint to restore the solutions,
+                                        scores and epoch counter from instead of scoring new 
+                                        solutions
         """
 
+        if isinstance(inputs, Dataset) and outputs is None:
+            outputs = inputs.targets
+
         # begin contracts on inputs -----------------------------
 
         if population_size < 10:
@@ -268,6 +1095,12 @@ class Population:
         if len(parameters) < 1:
             raise(ValueError)
 
+        if isinstance(inputs, Dataset) and not set(parameters) <= set(inputs.names):
+            raise(ValueError)
+
+        if outputs is None:
+            raise(ValueError)
+
         if operations_size < 2:
             raise(ValueError)
 
@@ -292,6 +1125,24 @@ class Population:
         if len(inputs) == 0:
             raise(ValueError)
 
+        if cache_size < 0:
+            raise(ValueError)
+
+        if tape_memory < 0:
+            raise(ValueError)
+
+        if n_jobs < 1:
+            raise(ValueError)
+
+        if not isinstance(selection, Strategy) and selection not in SELECTIONS:
+            raise(ValueError)
+
+        if not isinstance(replacement, Strategy) and replacement not in REPLACEMENTS:
+            raise(ValueError)
+
+        if racing < 0 or racing >= 1:
+            raise(ValueError)
+
         # end contracts on inputs -------------------------------
         
         self.pop_size = population_size
@@ -303,137 +1154,1136 @@ class Population:
         self.mutations = int(population_size * mutation_rate)
         self.kills = int(population_size * kill_rate)
         self.fitness_calc = error_calc
+        self.loss = _loss_of(error_calc)
+        self.residuals = None
+        self.early_stops = 0
+        self.racing = racing
+        self.linear_scaling = linear_scaling
+        self.race_stages = None
+        self.race_columns = None
+        self.race_stats = {'candidates': 0, 'eliminated': 0, 'samples': 0, 'full_samples': 0}
         self.inputs = inputs
         self.outputs = outputs
+        self.dataset = inputs if isinstance(inputs, Dataset) else None
+        if self.dataset is not None:
+            self.columns = self.dataset.get_columns(parameters)
+        else:
+            self.columns = {p: np.array([x[p] for x in inputs], dtype=float) for p in parameters}
+        self.targets = np.asarray(outputs, dtype=float)
+        self.multi_expression = multi_expression
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.tape_memory = tape_memory
+        self.tapes = OrderedDict()
+        self.tape_bytes = 0
+        self.n_jobs = n_jobs
+        self.pool = None
+        self.epoch = 0
+        self.batch_scores = False
+        self.trace = []
+        self.profile = profile
+        self.observers = []
+        self.metrics = []
+        self.counters = {'evaluations': 0, 'rows': 0, 'scoring_seconds': 0., 'children': 0, 
+                         'children_accepted': 0, 'mutations': 0, 'mutations_improved': 0}
+        self.selection = SELECTIONS[selection]() if selection in SELECTIONS else selection
+        self.replacement = REPLACEMENTS[replacement]() if replacement in REPLACEMENTS else replacement
         self.i = -1
         self.solutions = []
-        
-        for _ in range(self.pop_size):
-            self.solutions.append(Solution(self.parameters, self.ops_size, self.operands_size))    
 
-        self.scores = [None] * self.pop_size
+        # the genomes of every solution are stored in two contiguous arrays and each
+        # Solution is a view of its slot
+        self.operators, self.operand_tables = Solution.allocate(self.pop_size, 
+                len(self.parameters) + self.ops_size, self.operands_size)
+        
+        for idx in range(self.pop_size):
+            self.solutions.append(Solution(self.parameters, self.ops_size, self.operands_size, 
+                                           store=self.slot(idx)))    
 
-        self.update_scores()
+        if checkpoint is not None:
+            self.load_checkpoint(checkpoint)
+        else:
+            self.scores = ScoreIndex(self.evaluate_many(self.solutions))
 
 
     def get_best_score(self):
-        return min(self.scores)
+        return self.scores.best()
 
 
     def get_best_score_index(self):
-        return self.scores.index(self.get_best_score())
+        return self.scores.best_index()
 
 
     def get_best_solution(self):
-        return self.solutions[self.scores.index(self.get_best_score())]
+        return self.solutions[self.scores.best_index()]
 
 
     def get_avg_score(self):
-        return sum(self.scores) / self.pop_size
+        return self.scores.mean()
+
+
+    def evaluate(self, solution, bound=None):
+        """ Scores a solution against the training data, reusing the score of any
+            solution with the same effective program that is still in the cache
+
+        Args:
+            solution (Solution):    The solution to score
+            bound (float):          When given, scoring may stop as soon as the solution is 
+                                    known not to score below bound, and inf is returned
+        """
+        key = None
+        if self.cache_size > 0:
+            key = self.cache_key(solution)
+            score = self.cached_score(key, solution)
+            if score is not None:
+                return score
+
+        score = self.evaluate_within(solution, bound)
+
+        # a score cut short by the bound is inf, which is not the score of the solution
+        if key is not None and (bound is None or score < math.inf):
+            self.cache_score(key, solution, score)
+
+        return score
+
+
+    def evaluate_within(self, solution, bound=None):
+        """ Scores a solution that is not cached, racing it or stopping early when a bound
+            is given and the error calculation allows it """
+        start = time.perf_counter()
+
+        # the races and bounded scoring count the rows they score themselves
+        if bound is not None and self.can_bound(solution) and self.racing > 0:
+            score = self.evaluate_raced(solution, bound)
+        elif bound is not None and self.can_bound(solution) and len(self.targets) > _BOUND_CHUNK:
+            score = self.evaluate_bounded(solution, bound)
+        else:
+            score = self.evaluate_uncached(solution)
+            self.counters['rows'] += len(self.targets)
+
+        self.counters['evaluations'] += 1
+        self.counters['scoring_seconds'] += time.perf_counter() - start
+        return score
+
+
+    def can_bound(self, solution):
+        """ Returns whether scoring the solution in chunks could stop early """
+        return (self.loss is not None and not self.multi_expression and not self.linear_scaling
+                and self.stored_tape(solution) is None)
+
+
+    def evaluate_bounded(self, solution, bound):
+        """ Scores a solution on growing chunks of the training data, stopping as soon as
+            the sum of the losses so far means its error can not be below bound.
+
+        Returns:
+            float:  The score of the solution, or inf if the scoring stopped early
+        """
+        samples = len(self.targets)
+        rows = solution.effective_rows()
+        predictions = []
+        total = 0.
+        start = 0
+        size = max(_BOUND_CHUNK, samples // 16)
+
+        while start < samples:
+            stop = min(samples, start + size)
+            columns = {p: c[start:stop] for p, c in self.columns.items()}
+            pred = solution.compute_tape(columns, rows)[solution.output_row]
+            predictions.append(pred)
+            self.counters['rows'] += stop - start
+
+            with np.errstate(all='ignore'):
+                total += float(np.sum(self.loss(pred - self.targets[start:stop])))
+
+            if not total / samples < bound:
+                self.early_stops += 1
+                return math.inf
+
+            start = stop
+            size *= 2
+
+        return self.score_predictions(np.concatenate(predictions))
+
+
+    def evaluate_raced(self, solution, bound):
+        """ Scores a solution on growing random chunks of the training data, eliminating it
+            as soon as its error on the samples scored so far is not below bound.  The 
+            chunks cover the training data once, so a solution that survives every chunk 
+            costs no more than scoring it on all of the data.
+
+        Returns:
+            float:  The score of the solution, or inf if it was eliminated
+        """
+        rows = solution.effective_rows()
+        samples = len(self.targets)
+        predictions = np.empty(samples)
+        total = 0.
+        scored = 0
+
+        self.race_stats['candidates'] += 1
+        self.race_stats['full_samples'] += samples
+
+        for idx, columns, targets in self.get_race_stages():
+            pred = solution.compute_tape(columns, rows)[solution.output_row]
+            predictions[idx] = pred
+            scored += len(targets)
+            self.race_stats['samples'] += len(targets)
+            self.counters['rows'] += len(targets)
+
+            with np.errstate(all='ignore'):
+                total += float(np.sum(self.loss(pred - targets)))
+
+            if scored < samples and not total / scored < bound:
+                self.race_stats['eliminated'] += 1
+                return math.inf
+
+        return self.score_predictions(predictions)
+
+
+    def get_race_stages(self):
+        """ Returns the (indices, columns, targets) of the chunks of the training data a 
+            race scores solutions on, drawn again whenever the training data changes.  Each
+            chunk holds as many samples as all of the chunks before it times _RACE_GROWTH - 1
+        """
+        if self.race_columns is not self.columns:
+            samples = len(self.targets)
+            order = np.random.RandomState(random.randrange(2**32)).permutation(samples)
+            start = 0
+            stop = max(1, int(self.racing * samples))
+
+            self.race_stages = []
+            while start < samples:
+                idx = order[start:stop]
+                self.race_stages.append((idx, {p: c[idx] for p, c in self.columns.items()}, self.targets[idx]))
+                start, stop = stop, min(samples, stop * _RACE_GROWTH)
+
+            self.race_columns = self.columns
+
+        return self.race_stages
+
+
+    def get_race_bound(self):
+        """ Returns the score a candidate must stay below to survive a race """
+        scores = np.fromiter(self.scores, dtype=float, count=self.pop_size)
+        k = int(_RACE_QUANTILE * (self.pop_size - 1))
+        return float(np.partition(scores, k)[k])
+
+
+    def get_bound(self):
+        """ Returns the score the children or mutants of a phase are scored against: the 
+            worst score or, when racing, the race bound if it is lower.  Finding the race 
+            bound takes a pass over the scores, so it is found once for a phase rather than
+            for each candidate. """
+        if self.racing > 0:
+            return min(self.scores.worst(), self.get_race_bound())
+
+        return self.scores.worst()
+
+
+    def get_racing_stats(self):
+        """ Returns how many candidates were raced and eliminated and how many sample
+            evaluations racing saved compared to scoring every candidate on all of the data """
+        stats = dict(self.race_stats)
+        stats['saved'] = stats['full_samples'] - stats['samples']
+        stats['saved_fraction'] = stats['saved'] / stats['full_samples'] if stats['full_samples'] else 0.
+        return stats
+
+
+    def evaluate_many(self, solutions, bound=None):
+        """ Scores a list of solutions, evaluating all of the ones that are not cached
+            together in one sweep over the training data, or spread over the worker 
+            processes when n_jobs > 1.  Without workers, solutions are evaluated one at a
+            time instead when their tapes are kept or the training data is large, and then
+            a bound lets scoring stop early as in evaluate.
+
+        Returns:
+
+            list:   The score of each solution
+        """
+        scores = [None] * len(solutions)
+        keys = [None] * len(solutions)
+        batch = []
+
+        for k, s in enumerate(solutions):
+            if self.cache_size > 0:
+                keys[k] = self.cache_key(s)
+                scores[k] = self.cached_score(keys[k], s)
+
+            if scores[k] is not None:
+                continue
+
+            if self.n_jobs == 1 and (self.tape_memory > 0 or len(self.targets) > _BATCH_SAMPLES):
+                scores[k] = self.evaluate_within(s, bound)
+            else:
+                batch.append(k)
+
+        if batch:
+            start = time.perf_counter()
+            if self.n_jobs > 1:
+                batch_scores = self.get_pool().evaluate([solutions[k] for k in batch])
+            else:
+                batch_scores = self.evaluate_batch([solutions[k] for k in batch])
+
+            self.counters['evaluations'] += len(batch)
+            self.counters['rows'] += len(batch) * len(self.targets)
+            self.counters['scoring_seconds'] += time.perf_counter() - start
+
+            for k, score in zip(batch, batch_scores):
+                scores[k] = score
+
+        if self.cache_size > 0:
+            for k, s in enumerate(solutions):
+                if keys[k] not in self.cache and (bound is None or scores[k] < math.inf):
+                    self.cache_score(keys[k], s, scores[k])
+
+        return scores
+
+
+    def evaluate_batch(self, solutions):
+        """ Scores a list of solutions together
+
+        The effective rows of every solution are grouped by their depth in the program and
+        their operator, and each group is computed with one vectorized operation over a 
+        (rows x samples) slab of the combined calc tapes.  When the error calculation is a 
+        mean of a loss of the residuals the scores of every solution are reduced at once.
+        The samples are processed in chunks to bound the memory used by the calc tapes.
+
+        Returns:
+
+            list:   The score of each solution
+        """
+        # the predictions are scaled before they are scored, so every prediction is kept
+        loss = None if self.linear_scaling else self.loss
+
+        # without a vectorized loss every row would have to be kept for every sample
+        if self.multi_expression and loss is None:
+            return [self.evaluate_uncached(s) for s in solutions]
+
+        n = len(solutions)
+        params_size = solutions[0].params_size
+        ops_size = solutions[0].ops_size
+        samples = len(self.targets)
+        operators = np.stack([s.operators for s in solutions])
+        operands = np.stack([s.operand_table[:, :4] for s in solutions])
+        output_rows = np.array([s.output_row for s in solutions])
+
+        needed = np.ones((n, ops_size), dtype=bool)
+        if not self.multi_expression:
+            needed[:] = False
+            for k, s in enumerate(solutions):
+                needed[k, s.effective_rows()] = True
+
+        # rows at the same depth only read rows at lower depths, so the rows of every 
+        # solution at a depth that use the same operator are computed together
+        arity = np.zeros(len(Solution.Operator) + 1, dtype=np.intp)
+        for operator, a in _ARITY.items():
+            arity[operator] = a
+
+        depth = np.zeros((n, ops_size), dtype=np.intp)
+        k = np.arange(n)
+        for i in range(params_size, ops_size):
+            reads = np.arange(4) < arity[operators[:, i]][:, None]
+            depth[:, i] = 1 + np.max(np.where(reads, depth[k[:, None], operands[:, i]], 0), axis=1)
+
+        # the calc tape only holds the needed rows of each solution, ordered by group so
+        # the results of a group are a contiguous block.  position[k, i] is where row i
+        # of solution k is kept.
+        ks, rows = np.nonzero(needed)
+        group = (depth[ks, rows] * (len(Solution.Operator) + 1) + operators[ks, rows]) * ops_size
+        order = np.argsort(group + rows, kind='stable')
+        ks, rows, group = ks[order], rows[order], group[order]
+        position = np.zeros((n, ops_size), dtype=np.intp)
+        position[ks, rows] = np.arange(len(ks))
+
+        bounds = np.flatnonzero(np.diff(group)).tolist()
+        groups = []
+        for lo, hi in zip([0] + [b + 1 for b in bounds], [b + 1 for b in bounds] + [len(ks)]):
+            if rows[lo] < params_size:
+                continue
+            operator = int(operators[ks[lo], rows[lo]])
+            args = [position[ks[lo:hi], operands[ks[lo:hi], rows[lo:hi], j]] for j in range(_ARITY[operator])]
+            groups.append((_VECTOR_FUNCS[operator], lo, hi, args))
+
+        terminals = [(p, position[needed[:, i], i]) for i, p in enumerate(solutions[0].parameters)]
+        outputs = position[k, output_rows]
+
+        if self.multi_expression:
+            errors = np.zeros((n, ops_size - params_size))
+        elif loss is not None:
+            errors = np.zeros(n)
+        else:
+            predictions = np.empty((n, samples))
+
+        chunk = max(1, _BATCH_MEMORY // (8 * len(ks)))
+        buffer = np.empty((len(ks), min(chunk, samples)))
+
+        with np.errstate(all='ignore'):
+            for lo in range(0, samples, chunk):
+                hi = min(lo + chunk, samples)
+                calc_tape = buffer[:, :hi - lo]
+
+                for p, at in terminals:
+                    calc_tape[at] = self.columns[p][lo:hi]
+
+                for func, start, stop, args in groups:
+                    calc_tape[start:stop] = func(*[calc_tape[a] for a in args])
+
+                targets = self.targets[lo:hi]
+
+                if self.multi_expression:
+                    errors += loss(calc_tape[position[:, params_size:]] - targets).sum(axis=2)
+                elif loss is not None:
+                    errors += loss(calc_tape[outputs] - targets).sum(axis=1)
+                else:
+                    predictions[:, lo:hi] = calc_tape[outputs]
+
+        if self.linear_scaling:
+            return [self.score_scaled(s, pred) for s, pred in zip(solutions, predictions)]
+
+        if loss is None:
+            return [self.score_predictions(pred) for pred in predictions]
+
+        errors = np.where(np.isfinite(errors), errors / samples, math.inf)
+
+        if not self.multi_expression:
+            return errors.tolist()
+
+        best = np.argmin(errors, axis=1)
+        for s, row in zip(solutions, best):
+            s.set_output_row(params_size + int(row))
+
+        return errors[np.arange(n), best].tolist()
+
+
+    def get_pool(self):
+        """ Returns the pool of worker processes, starting it on first use """
+        if self.pool is None:
+            from formulabot.parallel import EvaluationPool
+            self.pool = EvaluationPool(self, self.n_jobs)
+
+        return self.pool
+
+
+    def get_mapped_dataset(self):
+        """ Returns the memory-mapped Dataset the population is scored on, or None if it 
+            is scored on data in memory """
+        d = self.dataset
+        if d is None or d.path is None or self.targets is not d.targets:
+            return None
+
+        if any(self.columns[p] is not d.columns[p] for p in self.parameters):
+            return None
+
+        return d
+
+
+    def close(self):
+        """ Stops the worker processes and releases the shared training data """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def __getstate__(self):
+        # the worker processes belong to this process
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['observers'] = []
+        return state
+
+
+    def __setstate__(self, state):
+        # the arrays of the solutions are pickled as copies, so they are made views of the
+        # genome store again and the tapes, which the solutions no longer hold, are dropped
+        self.__dict__.update(state)
+        for idx, s in enumerate(self.solutions):
+            s.bind(*self.slot(idx))
+        self.tapes = OrderedDict()
+        self.tape_bytes = 0
+
+
+    def cache_key(self, solution):
+        if self.multi_expression:
+            # every row is a candidate output so every row is part of the key
+            return tuple((solution.row(i)[0], tuple(solution.operands(i))) for i in range(solution.ops_size))
+
+        return solution.effective_program()
+
+
+    def cached_score(self, key, solution):
+        """ Returns the cached score for the key, or None when it is not cached """
+        if key not in self.cache:
+            self.cache_misses += 1
+            return None
+
+        self.cache.move_to_end(key)
+        self.cache_hits += 1
+        score, output_row, scaling = self.cache[key]
+        if self.multi_expression:
+            solution.set_output_row(output_row)
+        if self.linear_scaling:
+            solution.set_scaling(scaling)
+
+        return score
+
+
+    def cache_score(self, key, solution, score):
+        self.cache[key] = (score, solution.output_row, solution.scaling)
+
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+    def clear_cache(self):
+        self.cache.clear()
+
+
+    def evaluate_uncached(self, solution):
+        """ Scores a solution against the training data
+
+        Predictions that are not finite (overflow, nan) can not be scored by the 
+        error calculation and are given the worst possible score.
+
+        In multi expression mode every operation row is scored in the same pass, 
+        the best row becomes the output row of the solution and its score is returned.
+        """
+        if self.multi_expression:
+            rows = range(solution.ops_size)
+        else:
+            rows = solution.effective_rows()
+
+        calc_tape = solution.compute_tape(self.columns, rows, self.stored_tape(solution))
+        self.store_tape(solution, calc_tape)
+
+        if not self.multi_expression:
+            if self.linear_scaling:
+                return self.score_scaled(solution, calc_tape[solution.output_row])
+            return self.score_predictions(calc_tape[solution.output_row])
+
+        loss = self.loss
+        pred = calc_tape[solution.params_size:]
+        if self.linear_scaling:
+            offsets, slopes = _linear_fit(np.stack(pred), self.targets)
+            with np.errstate(all='ignore'):
+                pred = offsets[:, None] + slopes[:, None] * np.stack(pred)
+
+        if loss is None:
+            scores = [self.score_predictions(p) for p in pred]
+        else:
+            with np.errstate(all='ignore'):
+                errors = np.mean(loss(np.stack(pred) - self.targets), axis=1)
+            scores = np.where(np.isfinite(errors), errors, math.inf).tolist()
+
+        best = scores.index(min(scores))
+        solution.set_output_row(solution.params_size + best)
+        if self.linear_scaling:
+            solution.set_scaling((offsets[best], slopes[best]))
+
+        return scores[best]
+
+
+    def stored_tape(self, solution):
+        """ Returns the stored calc tape of the solution if it was computed from the 
+            current training data """
+        if solution._tape is not None and solution._tape_columns is self.columns:
+            return solution._tape
+
+        return None
+
+
+    def store_tape(self, solution, calc_tape):
+        """ Keeps the calc tape of the solution, discarding the least recently stored
+            tapes while over the tape memory """
+        if self.tape_memory == 0:
+            return
+
+        self.discard_tape(solution)
+        nbytes = sum(t.nbytes for t in calc_tape[solution.params_size:] if t is not None)
+        if nbytes > self.tape_memory:
+            return
+
+        solution._tape = calc_tape
+        solution._tape_columns = self.columns
+        self.tapes[id(solution)] = (solution, nbytes)
+        self.tape_bytes += nbytes
+
+        while self.tape_bytes > self.tape_memory:
+            self.discard_tape(next(iter(self.tapes.values()))[0])
+
+
+    def discard_tape(self, solution):
+        if id(solution) in self.tapes:
+            _, nbytes = self.tapes.pop(id(solution))
+            self.tape_bytes -= nbytes
+
+        solution._tape = None
+        solution._tape_columns = None
+
+
+    def score_predictions(self, pred):
+        if self.loss is not None:
+
+            # the residuals are computed in a buffer kept for the size of the training data
+            if self.residuals is None or self.residuals.shape != self.targets.shape:
+                self.residuals = np.empty(self.targets.shape)
+
+            with np.errstate(all='ignore'):
+                np.subtract(pred, self.targets, out=self.residuals)
+                error = float(np.mean(self.loss(self.residuals, out=self.residuals)))
+            return error if math.isfinite(error) else math.inf
+
+        if not np.all(np.isfinite(pred)):
+            return math.inf
+
+        return self.fitness_calc(self.targets, pred)
+
+
+    def score_scaled(self, solution, pred):
+        """ Fits the linear scaling of the predictions of the solution to the targets,
+            keeps it with the solution and returns the score of the scaled predictions """
+        scaling = _linear_fit(pred, self.targets)
+        solution.set_scaling(scaling)
+        return self.score_predictions(solution.scale(pred))
 
 
     def update_score(self, idx):
-        pred = [m for m in map(self.solutions[idx].compute, self.inputs)]
-        self.scores[idx] = self.fitness_calc(self.outputs, pred)
+        self.scores[idx] = self.evaluate(self.solutions[idx])
         return self.scores[idx]
 
 
-    def update_scores(self): 
-        for x in range(self.pop_size):
-            self.update_score(x)
+    def update_scores(self, indices=None): 
+        """ Scores the solutions at the given indices, or every solution, in one sweep """
+        if indices is None:
+            indices = range(self.pop_size)
 
+        scores = self.evaluate_many([self.solutions[x] for x in indices])
+        for x, score in zip(indices, scores):
+            self.scores[x] = score
 
-    def run_epochs(self, plot_nb=False):
-        if plot_nb:
 
-            pp = ProgressPlot(plot_names=["Best Case", "Convergence"],
-                  x_lim=[0, self.epochs], 
-                  line_names=["Population Avg.", "Best Solution"] )
-        
-        with tqdm(total=self.epochs, desc="Epochs") as pbar:
-            for _ in range(self.epochs):
-                self.crossover_many()
-                self.mutate_many()
-                self.kill_many()
+    def run_epochs(self, plot_nb=False, epochs=None, verbose=True, batch_size=None,
+                   checkpoint=None, checkpoint_every=10, reporters=None, simplify_every=None):
+        """ Evolves the population until the epochs are run, the population converges or an
+            optimal solution is found
+
+        In mini-batch mode each epoch is scored on the next batch_size rows of a shuffled
+        order of the training data, reshuffled after every pass over it.  The solutions 
+        are rescored on every new batch and on all of the training data at the end.
 
-                pbar.update(1)
+        Args:
+            plot_nb (bool):     Plot the progress in a notebook
+            epochs (int):       How many epochs to run.  Defaults to the epochs of the population
+            verbose (bool):     Show a progress bar and report why the run stopped early
+            batch_size (int):   The number of training rows each epoch is scored on.  None
+                                scores every epoch on all of the training data
+            checkpoint (str):   The file to save a checkpoint of the population to
+            checkpoint_every (int): How many epochs to run between checkpoints
+            reporters (list<Reporter>): Other reporters of the progress of the run
+            simplify_every (int):   How many epochs to run between simplifying every solution.
+                                None never simplifies them
+
+        Returns:
+            int:                The number of epochs that were run
+        """
+
+        # begin contracts on inputs -----------------------------
 
-                if plot_nb:
-                    pp.update([[self.get_best_score(),self.get_best_score()],
-                               [self.get_avg_score(), self.get_best_score()]])
+        if batch_size is not None and batch_size < 1:
+            raise(ValueError)
+
+        if checkpoint_every < 1:
+            raise(ValueError)
+
+        if simplify_every is not None and simplify_every < 1:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
 
-                if len(set(self.scores)) == 1:
-                    print("Convergence!")
+        if epochs is None:
+            epochs = self.epochs
+
+        checkpoint = (checkpoint, checkpoint_every)
+        reporters = get_reporters(plot_nb, verbose, reporters)
+
+        if batch_size is None or batch_size >= len(self.targets):
+            return self.run_batch_epochs(reporters, epochs, verbose, None, checkpoint, simplify_every)
+
+        columns, targets = self.columns, self.targets
+        self.batch_scores = True
+        try:
+            return self.run_batch_epochs(reporters, epochs, verbose, 
+                                         self.get_batches(columns, targets, batch_size), checkpoint,
+                                         simplify_every)
+        finally:
+            self.batch_scores = False
+            self.set_training_data(columns, targets)
+
+
+    def run_batch_epochs(self, reporters, epochs, verbose, batches, checkpoint, simplify_every=None):
+        """ Runs the epochs of run_epochs, each on the next (columns, targets) of batches 
+            when they are given, saving a (path, every) checkpoint """
+        for reporter in reporters:
+            reporter.start(self, epochs)
+
+        run = 0
+        try:
+            for _ in range(epochs):
+                if batches is not None:
+                    self.set_training_data(*next(batches))
+
+                if self.profile or self.observers:
+                    self.run_profiled_epoch()
+                else:
+                    self.crossover_many()
+                    self.mutate_many()
+                    self.kill_many()
+                    self.epoch += 1
+                    self.trace.append((self.epoch, self.get_best_score(), self.get_avg_score()))
+
+                run += 1
+
+                if simplify_every is not None and self.epoch % simplify_every == 0:
+                    self.simplify_solutions()
+
+                if checkpoint[0] is not None and self.epoch % checkpoint[1] == 0:
+                    self.save_checkpoint(checkpoint[0])
+
+                for reporter in reporters:
+                    reporter.update(self)
+
+                if self.scores.distinct() == 1:
+                    if verbose:
+                        print("Convergence!")
                     break
 
-                if round(self.get_best_score(), 7) == 0.0:
-                    print("Optimal Solution Found!")
+                if self.is_optimal():
+                    if verbose:
+                        print("Optimal Solution Found!")
                     break
+        finally:
+            for reporter in reporters:
+                reporter.finish(self)
 
-        if plot_nb:
-            pp.finalize()
+        return run
+
+
+    def run_profiled_epoch(self):
+        """ Runs an epoch like run_epochs, timing each phase, and hands the metrics of the
+            epoch to the observers and the metrics history """
+        before = dict(self.counters)
+        seconds = {}
+
+        for phase, func in (('crossover', self.crossover_many), ('mutate', self.mutate_many), 
+                            ('kill', self.kill_many)):
+            start = time.perf_counter()
+            func()
+            seconds[phase] = time.perf_counter() - start
+
+        self.epoch += 1
+        self.trace.append((self.epoch, self.get_best_score(), self.get_avg_score()))
+
+        counts = {k: v - before[k] for k, v in self.counters.items()}
+        seconds['scoring'] = counts['scoring_seconds']
+        seconds['total'] = seconds['crossover'] + seconds['mutate'] + seconds['kill']
+
+        metrics = {
+            'epoch':                self.epoch,
+            'best_score':           self.get_best_score(),
+            'avg_score':            self.get_avg_score(),
+            'seconds':              seconds,
+            'evaluations':          counts['evaluations'],
+            'rows':                 counts['rows'],
+            'evals_per_sec':        counts['evaluations'] / seconds['total'] if seconds['total'] else 0.,
+            'child_acceptance':     _rate(counts['children_accepted'], counts['children']),
+            'mutation_improvement': _rate(counts['mutations_improved'], counts['mutations']),
+        }
+
+        if self.profile:
+            self.metrics.append(metrics)
+
+        for observer in self.observers:
+            observer(self, metrics)
+
+        return metrics
+
+
+    def add_observer(self, observer):
+        """ Registers a callback that is called as observer(population, metrics) after every
+            epoch of run_epochs, with the metrics of the epoch.  Epochs are only timed while
+            profile is set or an observer is registered.
+
+        The metrics are a dict of the epoch, the best and average scores, the seconds spent
+        in the crossover, mutate and kill phases, in scoring within them and in total, the
+        number of solutions evaluated and of the rows they were evaluated on, the evaluations
+        per second, the fraction of the children that were accepted into the population and
+        the fraction of the mutations that improved the score of the solution.
+
+        Args:
+            observer (func):    The callback
+        """
+        self.observers.append(observer)
+
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+
+    def get_counters(self):
+        """ Returns the number of evaluations, the rows they were evaluated on, the seconds
+            spent scoring and the children and mutations offered and accepted so far """
+        return dict(self.counters)
+
+
+    def save_checkpoint(self, path):
+        """ Saves the genomes, scores, epoch counter and random state of the population to
+            a binary file.  The file is replaced at once, so a run that is killed while 
+            saving leaves the previous checkpoint intact.  Scores on a mini-batch are marked
+            as such, so they are not restored as scores on all of the training data.
+
+        Args:
+            path (str):     The checkpoint file
+        """
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, parameters=np.array(self.parameters),
+                     operators=self.operators, 
+                     operand_tables=self.operand_tables,
+                     output_rows=np.array([s.output_row for s in self.solutions]),
+                     scalings=np.array([s.scaling or (np.nan, np.nan) for s in self.solutions], dtype=float),
+                     scores=np.array(list(self.scores), dtype=float),
+                     epoch=np.array(self.epoch),
+                     batch_scores=np.array(self.batch_scores),
+                     random_state=np.frombuffer(pickle.dumps(random.getstate()), dtype=np.uint8))
+
+        os.replace(path + '.tmp', path)
+
+
+    def load_checkpoint(self, path):
+        """ Restores the genomes, scores, epoch counter and random state saved by 
+            save_checkpoint into a population created with the same arguments.  A run 
+            continued from the checkpoint makes the same choices as the run that saved it, 
+            except in mini-batch and racing modes, whose samples are drawn again.  The 
+            solutions of a checkpoint saved in mini-batch mode are scored again.
+
+        Args:
+            path (str):     The checkpoint file
+        """
+        with np.load(path) as f:
+            state = {k: f[k] for k in f.files}
+
+        # begin contracts on inputs -----------------------------
+
+        if state['parameters'].tolist() != list(self.parameters):
+            raise(ValueError)
+
+        if state['operand_tables'].shape != self.operand_tables.shape:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        for solution, _ in list(self.tapes.values()):
+            self.discard_tape(solution)
+        self.clear_cache()
+
+        self.operators[:] = state['operators']
+        self.operand_tables[:] = state['operand_tables']
+        scalings = state.get('scalings', np.full((self.pop_size, 2), np.nan)).tolist()
+        for s, row, scaling in zip(self.solutions, state['output_rows'].tolist(), scalings):
+            s.invalidate()
+            s.output_row = row
+            s.set_scaling(None if np.isnan(scaling).all() else scaling)
+
+        if state.get('batch_scores', False):
+            self.scores = ScoreIndex(self.evaluate_many(self.solutions))
+        else:
+            self.scores = ScoreIndex(state['scores'].tolist())
+        self.epoch = int(state['epoch'])
+        random.setstate(pickle.loads(state['random_state'].tobytes()))
+
+
+    def resume(self, path, **kwargs):
+        """ Restores a checkpoint and runs the rest of the epochs of the population, 
+            continuing to save checkpoints to the same file
+
+        Args:
+            path (str):     The checkpoint file
+            kwargs:         The other arguments of run_epochs
+
+        Returns:
+            int:            The number of epochs that were run
+        """
+        self.load_checkpoint(path)
+        return self.run_epochs(epochs=max(0, self.epochs - self.epoch), checkpoint=path, **kwargs)
+
+
+    def set_training_data(self, columns, targets):
+        """ Replaces the data the solutions are scored on and rescores every solution.
+            Cached scores and kept tapes of the old data are discarded and the worker 
+            processes are restarted on next use.
+
+        Args:
+            columns (dict):     A dictionary of equal length arrays keyed by parameter
+            targets (array):    The results to test the model against
+        """
+        self.columns = columns
+        self.targets = targets
+        self.clear_cache()
+        self.close()
+
+        for solution, _ in list(self.tapes.values()):
+            self.discard_tape(solution)
+
+        self.scores = ScoreIndex(self.evaluate_many(self.solutions))
+
+
+    def get_batches(self, columns, targets, batch_size):
+        """ Yields the (columns, targets) of consecutive batches of a shuffled order of 
+            the training data, reshuffling it after each pass.  The rows left over at the
+            end of a pass are skipped. """
+        samples = len(targets)
+
+        while True:
+            order = np.random.RandomState(random.randrange(2**32)).permutation(samples)
+            for start in range(0, samples - batch_size + 1, batch_size):
+                idx = np.sort(order[start:start+batch_size])
+                yield ({p: c[idx] for p, c in columns.items()}, targets[idx])
+
+
+    def is_optimal(self):
+        return round(self.get_best_score(), 7) == 0.0
+
+
+    def get_best_indices(self, count):
+        """ Returns the indices of the count best solutions, best first """
+        return self.scores.smallest(count)
+
+
+    def slot(self, idx):
+        """ Returns the views of the genome store arrays for the solution at idx """
+        return (self.operators[idx], self.operand_tables[idx])
+
+
+    def place(self, idx, solution):
+        """ Replaces the solution at idx, copying its genome into the store.  The 
+            replaced solution keeps a copy of its genome. """
+        self.discard_tape(self.solutions[idx])
+        self.solutions[idx].detach()
+        self.operators[idx] = solution.operators
+        self.operand_tables[idx] = solution.operand_table
+        solution.bind(*self.slot(idx))
+        self.solutions[idx] = solution
 
 
     def get_rand_solution(self):
         return self.solutions[random.randint(0,self.pop_size-1)]
 
 
-    def create_child(self):
-        parents = random.sample(self.solutions, k=2)
-        child = copy.deepcopy(parents[0])
+    def simplify_solutions(self):
+        """ Simplifies every solution in place and rescores the ones that were rewritten.
+            A simplified solution only scores differently when its original computed rows
+            that were not finite.
+
+        Returns:
+            int:    The number of solutions that were rewritten
+        """
+        changed = []
+        for idx, s in enumerate(self.solutions):
+            if s.simplify():
+                self.discard_tape(s)
+                changed.append(idx)
+
+        self.update_scores(changed)
+        return len(changed)
+
+
+    def get_strategy_costs(self):
+        """ Returns what the selection and replacement strategies have cost so far """
+        return {'selection': self.selection.cost(), 'replacement': self.replacement.cost()}
+
+
+    def spawn_child(self, parents=None, store=None):
+        """ Creates an unscored child solution from two parents, chosen by the selection 
+            strategy unless their indices are given.  The child is written into the store 
+            arrays when they are given. """
+        if parents is None:
+            parents = self.selection.select(self, 2)
+
+        parents = [self.solutions[x] for x in parents]
         splice = random.randint(0,self.ops_size)
-        child.ops[:splice] = parents[1].ops[:splice]
-        return (child, self.fitness_calc(self.outputs, [m for m in map(child.compute, self.inputs)]))
+        child = Solution.offspring(parents[0], parents[1], splice, store)
+
+        # the spliced rows only depend on each other so their values are shared
+        tape = self.stored_tape(parents[1])
+        if tape is not None:
+            child._tape = tape[:splice] + [None] * (child.ops_size - splice)
+            child._tape_columns = self.columns
+
+        return child
+
+
+    def create_child(self, parents=None, bound=None):
+        child = self.spawn_child(parents)
+        score = self.evaluate(child, bound)
+        if id(child) not in self.tapes:
+            self.discard_tape(child)
+
+        return (child, score)
+
+
+    def accept_child(self, c, s, parents=None):
+        """ Replaces the solution chosen by the replacement strategy with the child, or 
+            drops the child if none is chosen """
+        idx = self.replacement.target(self, c, s, parents)
+        self.counters['children'] += 1
+
+        if idx is not None:
+            self.counters['children_accepted'] += 1
+            self.place(idx, c)
+            self.scores[idx] = s
+        else:
+            self.discard_tape(c)
 
 
     def crossover_one(self):
-        c, s = self.create_child()
-        
-        if s < max(self.scores):
-            idx_max = self.scores.index(max(self.scores))
-            self.solutions[idx_max] = c
-            self.scores[idx_max] = s
+        parents = self.selection.select(self, 2)
+
+        # every replacement strategy rejects a child that is not better than the worst
+        c, s = self.create_child(parents, bound=self.get_bound())
+        self.accept_child(c, s, parents)
     
 
     def crossover_many(self):
-        for _ in range(self.crossovers):
-            if len(set(self.scores)) > 1:
-                self.crossover_one()
+        """ Creates the children of the epoch from the current solutions, scores them 
+            together and then offers them to the population one at a time """
+        if self.scores.distinct() <= 1:
+            return
+
+        parents = self.selection.select(self, 2 * self.crossovers)
+        parents = [parents[x:x+2] for x in range(0, len(parents), 2)]
+
+        # the children of the epoch are written into one scratch block, and only those
+        # that are accepted are copied into the genome store
+        operators, operand_tables = Solution.allocate(len(parents), 
+                len(self.parameters) + self.ops_size, self.operands_size)
+        children = [self.spawn_child(pair, (operators[k], operand_tables[k])) 
+                    for k, pair in enumerate(parents)]
+        scores = self.evaluate_many(children, bound=self.get_bound())
+
+        for c, s in zip(children, scores):
+            if id(c) not in self.tapes:
+                self.discard_tape(c)
+
+        for c, s, pair in zip(children, scores, parents):
+            if self.scores.distinct() > 1:
+                self.accept_child(c, s, pair)
             else:
                 break
 
 
     def kill_one(self):
-        s = self.get_rand_solution()
-        idx = self.solutions.index(s)
-
-        if self.scores.index(self.get_best_score()) != idx:
-        #if self.get_best_score_index != idx:
-            self.solutions[idx] = Solution(self.parameters, self.ops_size, self.operands_size)
+        idx = random.randint(0, self.pop_size-1)
+        s = self.solutions[idx]
+
+        if self.get_best_score_index() != idx:
+            self.discard_tape(s)
+            s.detach()
+            self.solutions[idx] = Solution(self.parameters, self.ops_size, self.operands_size, 
+                                           store=self.slot(idx))
             self.update_score(idx)
 
 
     def kill_many(self):
+        """ Replaces random solutions, other than the best solution at the start of the 
+            epoch, and scores the replacements together """
+        best = self.get_best_score_index()
+        killed = set()
+
         for _ in range(self.kills):
-            self.kill_one()
+            idx = random.randint(0, self.pop_size-1)
+
+            if idx != best:
+                self.discard_tape(self.solutions[idx])
+                self.solutions[idx].detach()
+                self.solutions[idx] = Solution(self.parameters, self.ops_size, self.operands_size, 
+                                               store=self.slot(idx))
+                killed.add(idx)
+
+        self.update_scores(sorted(killed))
 
 
     def mutate_one(self):
-        s = self.get_rand_solution()
-        idx = self.solutions.index(s)
-        
-        if self.scores.index(self.get_best_score()) != idx:
-        #if self.get_best_score_index != idx:
+        idx = random.randint(0, self.pop_size-1)
+        s = self.solutions[idx]
+
+        if self.get_best_score_index() != idx:
+            old = self.scores[idx]
+            snapshot = s.snapshot() if self.racing > 0 else None
             s.mutate()
-            self.update_score(idx)
+
+            if self.racing > 0:
+                self.scores[idx] = self.race_mutant(idx, snapshot, old, self.evaluate(s, bound=self.get_bound()))
+            else:
+                self.update_score(idx)
+
+            self.counters['mutations'] += 1
+            self.counters['mutations_improved'] += self.scores[idx] < old
 
 
     def mutate_many(self):
+        """ Mutates random solutions, other than the best solution at the start of the 
+            epoch, and scores the mutated solutions together.  When racing, the mutants 
+            are raced and those that are eliminated return to the solutions they were """
+        best = self.get_best_score_index()
+
+        # the score and snapshot of each mutated solution before its first mutation, in
+        # the order they were first mutated
+        mutated = {}
+
         for _ in range(self.mutations):
-            self.mutate_one()
+            idx = random.randint(0, self.pop_size-1)
+
+            if idx != best:
+                if idx not in mutated:
+                    mutated[idx] = (self.scores[idx], 
+                                    self.solutions[idx].snapshot() if self.racing > 0 else None)
+                self.solutions[idx].mutate()
+
+        if self.racing > 0:
+            scores = self.evaluate_many([self.solutions[x] for x in mutated], bound=self.get_bound())
+            for (x, (o, snapshot)), score in zip(mutated.items(), scores):
+                self.scores[x] = self.race_mutant(x, snapshot, o, score)
+        else:
+            self.update_scores(list(mutated))
+
+        self.counters['mutations'] += len(mutated)
+        self.counters['mutations_improved'] += sum(self.scores[x] < o for x, (o, _) in mutated.items())
+
+
+    def race_mutant(self, idx, snapshot, old, score):
+        """ Returns the score of a raced mutant.  A race eliminates every candidate that
+            scores worse than the median solution on its first samples, so a mutant that is
+            eliminated is returned to its snapshot and keeps its old score instead of an 
+            inf score. """
+        if score == math.inf and old != math.inf:
+            self.discard_tape(self.solutions[idx])
+            self.solutions[idx].restore(snapshot)
+            return old
+
+        return score
 
 
     def plot_predictions(self, solution, pred, act):
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots()
 
         x = [x for x in range(len(pred))]   
@@ -0,0 +1,156 @@
+import weakref
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from formulabot.mep import Population, Solution
+
+
+class SharedData:
+
+    def __init__(self, parameters, columns, targets):
+        """ The training data of a Population copied into a block of shared memory so that
+            worker processes can read it without it being pickled to them.
+
+        The block holds one row per parameter followed by a row of the targets.
+
+        Args:
+
+            parameters (list<str>):     The names of the columns, in order
+            columns (dict):             A dictionary of equal length arrays keyed by parameter
+            targets (array):            The results to test the model against
+        """
+        self.parameters = list(parameters)
+        self.samples = len(targets)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * (len(parameters) + 1) * self.samples))
+
+        data = self.view(self.shm, len(self.parameters), self.samples)
+        for i, p in enumerate(self.parameters):
+            data[i] = columns[p]
+        data[-1] = targets
+
+
+    @staticmethod
+    def view(shm, params_size, samples):
+        return np.ndarray((params_size + 1, samples), dtype=float, buffer=shm.buf)
+
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class EvaluationPool:
+
+    def __init__(self, population, n_jobs):
+        """ A persistent pool of worker processes that score solutions for a Population.
+
+        Each worker reads the training data from shared memory once, when it starts, and
+        afterwards only the genomes of the solutions to score are sent to it.  A memory-mapped
+        Dataset is mapped by each worker instead of being copied into shared memory.  A pool
+        that is dropped without being closed stops its workers and releases the shared memory
+        when it is garbage collected.
+
+        Args:
+
+            population (Population):    The population to score solutions for
+            n_jobs (int):               The number of worker processes
+        """
+        self.n_jobs = n_jobs
+        dataset = population.get_mapped_dataset()
+
+        if dataset is not None:
+            self.data = None
+            initargs = (_worker_state(population), None, None, dataset)
+        else:
+            self.data = SharedData(population.parameters, population.columns, population.targets)
+            initargs = (_worker_state(population), self.data.shm.name, self.data.samples, None)
+
+        self.executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_initialize, initargs=initargs)
+        self._finalizer = weakref.finalize(self, _shutdown, self.executor, self.data)
+
+
+    def evaluate(self, solutions):
+        """ Scores the solutions in the worker processes
+
+        Returns:
+
+            list:   The score of each solution
+        """
+        chunks = np.array_split(np.arange(len(solutions)), min(self.n_jobs, len(solutions)))
+        futures = []
+
+        for chunk in chunks:
+            batch = [solutions[k] for k in chunk]
+            futures.append(self.executor.submit(_evaluate,
+                    np.stack([s.operators for s in batch]),
+                    np.stack([s.operand_table for s in batch]),
+                    [s.output_row for s in batch]))
+
+        scores = []
+        for chunk, future in zip(chunks, futures):
+            chunk_scores, output_rows, scalings = future.result()
+            scores.extend(chunk_scores)
+
+            # in multi expression mode the worker chose the output rows, and in linear
+            # scaling mode it fit their scalings
+            for k, row, scaling in zip(chunk, output_rows, scalings):
+                solutions[k].set_output_row(row)
+                solutions[k].set_scaling(scaling)
+
+        return scores
+
+
+    def close(self):
+        self._finalizer()
+
+
+def _shutdown(executor, data):
+    executor.shutdown()
+    if data is not None:
+        data.close()
+
+
+def _worker_state(population):
+    """ the attributes a worker needs to score solutions like the population, without
+        its solutions, training data, cache or tapes """
+    state = {k: population.__dict__[k] for k in
+             ['parameters', 'ops_size', 'operands_size', 'fitness_calc', 'loss', 'multi_expression',
+              'linear_scaling']}
+    state.update(residuals=None, early_stops=0, cache_size=0, cache=OrderedDict(), cache_hits=0, cache_misses=0,
+                 tape_memory=0, tapes=OrderedDict(), tape_bytes=0, n_jobs=1, pool=None,
+                 counters=dict.fromkeys(population.counters, 0))
+    return state
+
+
+# the population used to score solutions in a worker process
+_population = None
+_shm = None
+
+
+def _initialize(state, name, samples, dataset):
+    global _population, _shm
+
+    _population = Population.__new__(Population)
+    _population.__dict__.update(state)
+
+    if dataset is not None:
+        _population.columns = dataset.get_columns(state['parameters'])
+        _population.targets = dataset.targets
+        return
+
+    _shm = shared_memory.SharedMemory(name=name)
+    data = SharedData.view(_shm, len(state['parameters']), samples)
+    _population.columns = {p: data[i] for i, p in enumerate(state['parameters'])}
+    _population.targets = data[-1]
+
+
+def _evaluate(operators, operand_tables, output_rows):
+    solutions = []
+    for k in range(len(operators)):
+        s = Solution.from_arrays(_population.parameters, operators[k], operand_tables[k])
+        s.set_output_row(output_rows[k])
+        solutions.append(s)
+
+    scores = _population.evaluate_many(solutions)
+    return (scores, [s.output_row for s in solutions], [s.scaling for s in solutions])
@@ -0,0 +1,63 @@
+class Reporter:
+    """ The base of the reporters that show the progress of Population.run_epochs.  A
+        reporter is started before the first epoch, updated after every epoch and finished
+        when the run ends, and imports what it needs to show the progress when it starts,
+        so the engine itself never loads a plotting or progress bar library. """
+
+    def start(self, population, epochs):
+        pass
+
+
+    def update(self, population):
+        pass
+
+
+    def finish(self, population):
+        pass
+
+
+class ProgressBar(Reporter):
+    """ Shows a tqdm progress bar of the epochs """
+
+    def start(self, population, epochs):
+        from tqdm import tqdm
+        self.pbar = tqdm(total=epochs, desc="Epochs")
+
+
+    def update(self, population):
+        self.pbar.update(1)
+
+
+    def finish(self, population):
+        self.pbar.close()
+
+
+class NotebookPlot(Reporter):
+    """ Plots the best and average scores of each epoch in a notebook with jupyterplot """
+
+    def start(self, population, epochs):
+        from jupyterplot import ProgressPlot
+        self.pp = ProgressPlot(plot_names=["Best Case", "Convergence"],
+                               x_lim=[0, epochs],
+                               line_names=["Population Avg.", "Best Solution"])
+
+
+    def update(self, population):
+        best = population.get_best_score()
+        self.pp.update([[best, best], [population.get_avg_score(), best]])
+
+
+    def finish(self, population):
+        self.pp.finalize()
+
+
+def get_reporters(plot_nb=False, verbose=True, reporters=None):
+    """ Returns the reporters of a run: a NotebookPlot when plot_nb is set, a ProgressBar
+        when verbose is set and any other given reporters """
+    chosen = []
+    if plot_nb:
+        chosen.append(NotebookPlot())
+    if verbose:
+        chosen.append(ProgressBar())
+
+    return chosen + list(reporters or [])
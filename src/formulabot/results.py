@@ -0,0 +1,164 @@
+import os
+import csv
+import queue
+import threading
+
+
+# the columns of a results row, in order, with the key of the result they are taken from
+# and their type.  They follow the columns of the existing results files.
+COLUMNS = [
+    ('population_size',   'population_size', int),
+    ('operations_size',   'operations_size', int),
+    ('operands_size',     'operands_size',   int),
+    ('epochs',            'epochs',          int),
+    ('crossover_rate',    'crossover_rate',  float),
+    ('mutation_rate',     'mutation_rate',   float),
+    ('kill_rate',         'kill_rate',       float),
+    ('train_score',       'train_score',     float),
+    ('test_score',        'test_score',      float),
+    ('train_size',        'train_rows',      int),
+    ('test_size',         'test_rows',       int),
+    ('latex_string',      'latex_string',    str),
+    ('calc_time_seconds', 'calc_time',       float),
+    ('scenario',          'scenario',        str),
+]
+
+TRACE_COLUMNS = ['scenario', 'epoch', 'best_score', 'avg_score']
+
+
+class ResultsSink:
+
+    def __init__(self, path, traces_path=None, parquet_path=None, batch_size=32):
+        """ Collects the results of scenarios and writes them in batches from a background
+            thread, so that recording a result never waits on the file system.
+
+        The results are appended to a CSV file, with a header row when the file is new, and
+        the per-epoch convergence trace of each scenario to a second CSV file.  The results
+        can also be written to a Parquet file when the sink is closed, which needs pyarrow.
+
+        Args:
+
+            path (str):             The CSV file the results are appended to
+            traces_path (str):      The CSV file the convergence traces are appended to, if any
+            parquet_path (str):     The Parquet file to write every result to, if any
+            batch_size (int):       How many results are collected before they are written. >= 1
+        """
+
+        # begin contracts on inputs -----------------------------
+
+        if batch_size < 1:
+            raise(ValueError)
+
+        if parquet_path is not None:
+            try:
+                import pyarrow
+            except ImportError:
+                raise ImportError("writing Parquet results requires pyarrow")
+
+        # end contracts on inputs -------------------------------
+
+        self.path = path
+        self.traces_path = traces_path
+        self.parquet_path = parquet_path
+        self.batch_size = batch_size
+        self.rows = []
+        self.traces = []
+        self.written = []
+        self.queue = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._write_batches, daemon=True)
+        self.thread.start()
+
+
+    def write(self, result):
+        """ Records the result of a scenario
+
+        Args:
+
+            result (dict):  The scenario, with the keys of COLUMNS and optionally a trace of
+                            (epoch, best score, average score) tuples.  train_rows and test_rows
+                            may be the rows themselves, in which case their number is recorded
+        """
+        row = []
+        for _, key, kind in COLUMNS:
+            value = result[key]
+            if key in ('train_rows', 'test_rows') and not isinstance(value, int):
+                value = len(value)
+            row.append(kind(value))
+
+        self.rows.append(row)
+        self.traces.extend([result['scenario']] + list(t) for t in result.get('trace', []))
+
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self):
+        """ Hands the collected results to the writer thread """
+        if self.error is not None:
+            raise self.error
+
+        if self.rows or self.traces:
+            self.queue.put((self.rows, self.traces))
+            self.rows = []
+            self.traces = []
+
+
+    def close(self):
+        """ Writes the remaining results, waits for the writer thread and writes the Parquet
+            file """
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+        if self.parquet_path is not None:
+            self._write_parquet()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def _write_batches(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+
+            rows, traces = batch
+            try:
+                self._append(self.path, [name for name, _, _ in COLUMNS], rows)
+                if self.traces_path is not None:
+                    self._append(self.traces_path, TRACE_COLUMNS, traces)
+                if self.parquet_path is not None:
+                    self.written.extend(rows)
+            except Exception as e:
+                self.error = e
+
+
+    @staticmethod
+    def _append(path, header, rows):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(header)
+            writer.writerows(rows)
+
+
+    def _write_parquet(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        types = {str: pyarrow.string(), int: pyarrow.int64(), float: pyarrow.float64()}
+        schema = pyarrow.schema([(name, types[kind]) for name, _, kind in COLUMNS])
+        columns = list(zip(*self.written)) if self.written else [[] for _ in COLUMNS]
+        table = pyarrow.table([list(c) for c in columns], schema=schema)
+        pyarrow.parquet.write_table(table, self.parquet_path)
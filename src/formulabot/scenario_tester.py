@@ -1,94 +1,96 @@
+import os
 import math
+import uuid
+import argparse
+import tempfile
 import numpy as np
-import pandas as pd
 import statistics
 import time
 import concurrent
 import copy
 import random
 from concurrent.futures import ProcessPoolExecutor
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-from sklearn.model_selection import train_test_split
-from formulabot.mep import Solution, Population
-from tqdm import tqdm
-
-
-def main():
-
-    source_data_path = r"C:\Users\markr\Projects\Software\FormulaBot\data\hypotenuse_01.csv"
-    results_path = r"C:\Users\markr\Projects\Software\FormulaBot\data\hypotenuse_01_results.csv"
-    scenarios_to_run = 25
-
-    df = pd.read_csv(source_data_path)
-    X = df[['X','Y']].to_dict(orient='records')
-    Y = df['out'].tolist()
-    X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.33)
-
-    rng = np.arange(scenarios_to_run)
+from formulabot.mep import Solution, Population, mse
+from formulabot.dataset import Dataset
+from formulabot.results import ResultsSink
+
+
+# the (low, high) ranges the scenario parameters are sampled from.  The rates are 
+# sampled as percentages.
+PARAMETER_RANGES = {
+    'population_size': (100, 501),
+    'operations_size': (10, 101),
+    'operands_size':   (30, 51),
+    'epochs':          (400, 1001),
+    'crossover_rate':  (20, 81),
+    'mutation_rate':   (1, 31),
+    'kill_rate':       (1, 31),
+}
+
+RATES = ['crossover_rate', 'mutation_rate', 'kill_rate']
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Runs FormulaBot on scenarios of randomly sampled parameters")
+    parser.add_argument('--data', default=r"C:\Users\markr\Projects\Software\FormulaBot\data\hypotenuse_01.csv",
+                        help="the CSV file of the data, with the results in its last column")
+    parser.add_argument('--results', default=r"C:\Users\markr\Projects\Software\FormulaBot\data\hypotenuse_01_results.csv",
+                        help="the CSV file the results are appended to")
+    parser.add_argument('--traces', default=None, help="the CSV file the per-epoch convergence traces are appended to")
+    parser.add_argument('--parquet', default=None, help="a Parquet file to also write the results to")
+    parser.add_argument('--scenarios', type=int, default=25, help="the number of scenarios to sample")
+    parser.add_argument('--sweep', action='store_true', 
+                        help="run a successive halving sweep instead of every scenario to completion")
+    parser.add_argument('--min-epochs', type=int, default=25, help="the epochs of the first round of a sweep")
+    parser.add_argument('--keep', type=float, default=0.5, help="the fraction of the scenarios each round of a sweep keeps")
+    parser.add_argument('--checkpoint-dir', default=None, help="where a sweep keeps the checkpoints of its scenarios")
+    args = parser.parse_args(argv)
+
+    from sklearn.model_selection import train_test_split
+
+    data = Dataset.from_csv(args.data)
+    train_rows, test_rows = train_test_split(np.arange(len(data)), test_size=0.33)
 
     d = {}
     results = []
-    d['parms'] = list(df.columns[:-1])
-    d['X_train'] = X_train 
-    d['y_train'] = y_train
-    d['X_test']  = X_test
-    d['y_test']  = y_test
-
-    with ProcessPoolExecutor() as executor:
-        for _ in rng:
-            d['population_size'] = random.randint(100,501)
-            d['operations_size'] = random.randint(10,101)
-            d['operands_size'] = random.randint(30,51)
-            d['epochs'] = random.randint(400,1001)
-            d['crossover_rate'] = random.randint(20, 81)/100.
-            d['mutation_rate'] = random.randint(1, 31)/100.
-            d['kill_rate'] = random.randint(1, 31)/100.
-
-            results.append(executor.submit(run_scenario, copy.deepcopy(d)))
+    d['parms'] = data.parameters
+    d['data'] = data
+    d['train_rows'] = train_rows
+    d['test_rows'] = test_rows
+
+    with ProcessPoolExecutor() as executor, ResultsSink(args.results, args.traces, args.parquet) as sink:
+        if args.sweep:
+            configurations = [dict(d, scenario=uuid.uuid4().hex, **sample_configuration()) 
+                              for _ in range(args.scenarios)]
+            winner = successive_halving(configurations, executor, args.min_epochs, args.keep, args.checkpoint_dir)
+            results.append(executor.submit(finish_scenario, winner))
+        else:
+            for _ in range(args.scenarios):
+                d.update(sample_configuration())
+                d['scenario'] = uuid.uuid4().hex
+                results.append(executor.submit(run_scenario, copy.deepcopy(d)))
 
         for r in concurrent.futures.as_completed(results):   
-            write_to_log(r, results_path) 
-            print(f"pop:{r.result()['population_size']} | ops:{r.result()['operations_size']} | opr:{r.result()['operands_size']}")
-            print(f"epochs: {r.result()['epochs']}, train: {r.result()['train_score']} | test: {r.result()['test_score']}")
-            
-            
-def write_to_log(r, fp):
-    with open(fp, 'a') as f:
-        f.write(str(r.result()['population_size']))
-        f.write(',')
-        f.write(str(r.result()['operations_size']))
-        f.write(',')
-        f.write(str(r.result()['operands_size']))
-        f.write(',')
-        f.write(str(r.result()['epochs']))
-        f.write(',')
-        f.write(str(r.result()['crossover_rate']))
-        f.write(',')
-        f.write(str(r.result()['mutation_rate']))
-        f.write(',')
-        f.write(str(r.result()['kill_rate']))
-        f.write(',')
-        f.write(str(r.result()['train_score']))
-        f.write(',')
-        f.write(str(r.result()['test_score']))
-        f.write(',')
-        f.write(str(len(r.result()['X_train'])))
-        f.write(',')
-        f.write(str(len(r.result()['X_test'])))
-        f.write(',')
-        f.write(r.result()['latex_string'])
-        f.write(',')
-        f.write(str(r.result()['calc_time']))
-        f.write(',')
-        f.write(str(id(r.result)))
-        f.write('\n')
-            
+            result = r.result()
+            sink.write(result)
+            print(f"pop:{result['population_size']} | ops:{result['operations_size']} | opr:{result['operands_size']}")
+            print(f"epochs: {result['epochs']}, train: {result['train_score']} | test: {result['test_score']}")
 
-def run_scenario(d):
 
-    start = time.perf_counter()
+def sample_configuration():
+    """ Returns the parameters of a scenario sampled from the PARAMETER_RANGES """
+    d = {}
+    for k, (low, high) in PARAMETER_RANGES.items():
+        d[k] = random.randint(low, high)
+        if k in RATES:
+            d[k] = d[k] / 100.
 
-    p = Population(population_size=d['population_size'], 
+    return d
+            
+            
+def build_population(d, data, checkpoint=None):
+    return Population(population_size=d['population_size'], 
     parameters=list(d['parms']), 
     operations_size=d['operations_size'], 
     operands_size=d['operands_size'], 
@@ -96,23 +98,126 @@ def run_scenario(d):
     crossover_rate=d['crossover_rate'], 
     mutation_rate=d['mutation_rate'], 
     kill_rate=d['kill_rate'],
-    error_calc=mean_squared_error,
-    inputs=d['X_train'], 
-    outputs=d['y_train'])
+    error_calc=mse,
+    inputs=data,
+    checkpoint=checkpoint)
+
+
+def score_scenario(d, p):
+    """ Records the train and test scores and the formula of the best solution of p in d """
+    test = d['data'].take(d['test_rows'])
+
+    d['train_score'] = p.get_best_score()
+    d['test_score'] = p.fitness_calc(test.targets, 
+            p.get_best_solution().compute_batch(test.get_columns(p.parameters)))
+    d['latex_string'] = p.get_best_solution().to_latex_string()
+
+    return(d)
+
+
+def run_scenario(d):
+
+    start = time.perf_counter()
+
+    # the dataset is memory-mapped again in this process, so only its rows are copied
+    p = build_population(d, d['data'].take(d['train_rows']))
 
     # run epochs
     p.run_epochs(plot_nb=False)
 
     end = time.perf_counter()
 
-    d['train_score'] = p.get_best_score()
-    d['test_score'] = p.fitness_calc(d['y_test'], 
-            [m for m in map(p.get_best_solution().compute, d['X_test'])])
-    d['latex_string'] = p.get_best_solution().to_latex_string()
+    score_scenario(d, p)
     d['calc_time'] = round(end - start, 2)
+    d['trace'] = p.trace
 
     return(d)
 
 
+def successive_halving(configurations, executor, min_epochs=25, keep=0.5, checkpoint_dir=None):
+    """ Finds the best of the scenario configurations without running every one of them to
+        completion
+
+    Every configuration is run for min_epochs and the keep fraction of them with the best 
+    train scores are kept.  The survivors are resumed from their checkpoints for 1 / keep times
+    as many epochs as the round before, and so on until one configuration is left, which is
+    run for one more round.  No configuration runs for more than its own epochs.
+
+    Args:
+
+        configurations (list<dict>):    The scenarios, as passed to run_scenario
+        executor (Executor):            Runs the rounds of the scenarios concurrently
+        min_epochs (int):               The epochs of the first round. >= 1
+        keep (float):                   The fraction of the scenarios kept after each round. 0 < keep < 1
+        checkpoint_dir (str):           Where the checkpoints are kept.  Defaults to a temporary directory
+
+    Returns:
+
+        dict:   The winning scenario, with its train score, epochs run, run time and checkpoint
+    """
+
+    # begin contracts on inputs -----------------------------
+
+    if len(configurations) < 1:
+        raise(ValueError)
+
+    if min_epochs < 1:
+        raise(ValueError)
+
+    if keep <= 0 or keep >= 1:
+        raise(ValueError)
+
+    # end contracts on inputs -------------------------------
+
+    if checkpoint_dir is None:
+        checkpoint_dir = tempfile.mkdtemp(prefix='formulabot_sweep_')
+
+    survivors = []
+    for i, d in enumerate(configurations):
+        d = dict(d, calc_time=0., epochs_run=0)
+        d['checkpoint'] = os.path.join(checkpoint_dir, 'scenario_{}.ckpt'.format(i))
+        survivors.append(d)
+
+    budget = min_epochs
+
+    while True:
+        futures = [executor.submit(run_round, dict(d, budget=budget)) for d in survivors]
+        ranked = sorted((f.result() for f in futures), key=lambda d: d['train_score'])
+
+        if len(ranked) == 1:
+            return ranked[0]
+
+        survivors = ranked[:max(1, int(len(ranked) * keep))]
+        budget = math.ceil(budget / keep)
+
+
+def run_round(d):
+    """ Runs a scenario for the epochs of its budget, continuing from its checkpoint, and
+        saves its checkpoint again """
+    start = time.perf_counter()
+
+    # the first round scores a new population and later rounds restore it without scoring
+    checkpoint = d['checkpoint'] if os.path.exists(d['checkpoint']) else None
+    p = build_population(d, d['data'].take(d['train_rows']), checkpoint)
+
+    p.run_epochs(plot_nb=False, epochs=max(0, min(d['budget'], d['epochs'] - p.epoch)), verbose=False)
+    p.save_checkpoint(d['checkpoint'])
+
+    d['train_score'] = p.get_best_score()
+    d['epochs_run'] = p.epoch
+    d['trace'] = d.get('trace', []) + p.trace
+    d['calc_time'] = round(d['calc_time'] + time.perf_counter() - start, 2)
+
+    return(d)
+
+
+def finish_scenario(d):
+    """ Scores the scenario saved in the checkpoint of a sweep like run_scenario would, 
+        recording the epochs it ran rather than the epochs it was sampled with """
+    p = build_population(d, d['data'].take(d['train_rows']), d['checkpoint'])
+    d['epochs'] = d['epochs_run']
+    return score_scenario(d, p)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+import math
+import heapq
+from collections import Counter
+
+
+class ScoreIndex:
+
+    def __init__(self, scores):
+        """ The scores of a Population, indexed so that the best and worst scores and the
+            number of distinct scores are known without scanning all of them.
+
+        It is used like a list of the scores.  The best and worst scores are kept in heaps
+        whose outdated entries are dropped when they reach the top, so finding them and
+        changing a score take O(log n).  Ties resolve to the lowest index, as list.index
+        would, and a NaN score is kept as inf so that it ranks last.  The mean is only used
+        for reporting and is summed exactly when it is asked for, as a running sum would
+        lose the small scores whenever a very large score enters and leaves the index.
+
+        Args:
+
+            scores (list<float>):   The score of each solution
+        """
+        self._scores = [_rankable(s) for s in scores]
+        self._rebuild()
+
+
+    def __len__(self):
+        return len(self._scores)
+
+
+    def __getitem__(self, idx):
+        return self._scores[idx]
+
+
+    def __iter__(self):
+        return iter(self._scores)
+
+
+    def __repr__(self):
+        return 'ScoreIndex({})'.format(self._scores)
+
+
+    def __setitem__(self, idx, score):
+        score = _rankable(score)
+        old = self._scores[idx]
+        if old == score:
+            return
+
+        self._infinite -= not math.isfinite(old)
+        self._counts[old] -= 1
+        if self._counts[old] == 0:
+            del self._counts[old]
+
+        self._scores[idx] = score
+        self._infinite += not math.isfinite(score)
+        self._counts[score] += 1
+
+        heapq.heappush(self._min_heap, (score, idx))
+        heapq.heappush(self._max_heap, (-score, idx))
+
+        # the outdated entries are dropped lazily, so rebuild before they dominate
+        if len(self._min_heap) > 4 * len(self._scores) + 16:
+            self._rebuild()
+
+
+    def best_index(self):
+        return self._top(self._min_heap, 1)
+
+
+    def worst_index(self):
+        return self._top(self._max_heap, -1)
+
+
+    def best(self):
+        return self._scores[self.best_index()]
+
+
+    def worst(self):
+        return self._scores[self.worst_index()]
+
+
+    def mean(self):
+        if self._infinite:
+            return math.inf
+        return math.fsum(self._scores) / len(self._scores)
+
+
+    def distinct(self):
+        """ Returns the number of distinct scores """
+        return len(self._counts)
+
+
+    def smallest(self, count):
+        """ Returns the indices of the count best scores, best first """
+        return heapq.nsmallest(count, range(len(self._scores)), key=self._scores.__getitem__)
+
+
+    def _top(self, heap, sign):
+        while sign * heap[0][0] != self._scores[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][1]
+
+
+    def _rebuild(self):
+        self._counts = Counter(self._scores)
+        self._infinite = sum(not math.isfinite(s) for s in self._scores)
+
+        self._min_heap = [(s, i) for i, s in enumerate(self._scores)]
+        self._max_heap = [(-s, i) for i, s in enumerate(self._scores)]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+
+
+def _rankable(score):
+    return math.inf if math.isnan(score) else score
@@ -0,0 +1,219 @@
+import time
+import random
+import numpy as np
+
+
+class Strategy:
+
+    def __init__(self):
+        """ The base of the selection and replacement strategies of a Population.  A strategy
+            keeps count of how often it was used and how long it took. """
+        self.calls = 0
+        self.seconds = 0.
+
+
+    def cost(self):
+        """ Returns what the strategy has cost so far
+
+        Returns:
+            dict:   The name of the strategy, the number of calls and the seconds spent
+        """
+        return {'strategy': type(self).__name__, 'calls': self.calls, 'seconds': self.seconds}
+
+
+    def reset(self):
+        self.calls = 0
+        self.seconds = 0.
+
+
+class Selection(Strategy):
+
+    def select(self, population, count):
+        """ Returns the indices of count parents chosen from the population """
+        start = time.perf_counter()
+        parents = self.choose(population, count)
+        self.calls += 1
+        self.seconds += time.perf_counter() - start
+        return parents
+
+
+    def choose(self, population, count):
+        raise NotImplementedError
+
+
+class RandomSelection(Selection):
+    """ Chooses the parents uniformly at random, ignoring their scores.  Each pair of
+        parents are distinct solutions. """
+
+    def choose(self, population, count):
+        parents = []
+        while len(parents) < count:
+            parents.extend(random.sample(range(population.pop_size), k=2))
+        return parents[:count]
+
+
+class TournamentSelection(Selection):
+
+    def __init__(self, size=2):
+        """ Chooses each parent as the best of size solutions drawn at random
+
+        Args:
+            size (int):     The number of solutions in a tournament. size >= 1
+        """
+
+        # begin contracts on inputs -----------------------------
+
+        if size < 1:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        super().__init__()
+        self.size = size
+
+
+    def choose(self, population, count):
+        scores = population.scores
+        parents = []
+
+        for _ in range(count):
+            entrants = [random.randint(0, population.pop_size-1) for _ in range(self.size)]
+            parents.append(min(entrants, key=scores.__getitem__))
+
+        return parents
+
+
+class FitnessProportionalSelection(Selection):
+    """ Chooses the parents with a probability proportional to 1 / (1 + score - best score),
+        so the best solution has weight 1 and solutions with an infinite score are never
+        chosen unless every solution has one """
+
+    def choose(self, population, count):
+        scores = np.fromiter(population.scores, dtype=float, count=population.pop_size)
+        weights = np.zeros(population.pop_size)
+        finite = np.isfinite(scores)
+
+        if not finite.any():
+            return [random.randint(0, population.pop_size-1) for _ in range(count)]
+
+        weights[finite] = 1. / (1. + scores[finite] - scores[finite].min())
+        return random.choices(range(population.pop_size), cum_weights=np.cumsum(weights).tolist(), k=count)
+
+
+class Replacement(Strategy):
+
+    def __init__(self):
+        super().__init__()
+        self.replaced = 0
+
+
+    def cost(self):
+        cost = super().cost()
+        cost['replaced'] = self.replaced
+        return cost
+
+
+    def reset(self):
+        super().reset()
+        self.replaced = 0
+
+
+    def target(self, population, child, score, parents=None):
+        """ Returns the index of the solution the child replaces, or None if the child
+            is rejected
+
+        Args:
+            population (Population):    The population the child is offered to
+            child (Solution):           The child solution
+            score (float):              The score of the child
+            parents (list<int>):        The indices of the parents of the child, when known
+        """
+        start = time.perf_counter()
+        idx = self.choose(population, child, score, parents)
+        self.calls += 1
+        self.seconds += time.perf_counter() - start
+
+        if idx is not None:
+            self.replaced += 1
+
+        return idx
+
+
+    def choose(self, population, child, score, parents):
+        raise NotImplementedError
+
+
+class WorstReplacement(Replacement):
+    """ The child replaces the worst solution if it scores better """
+
+    def choose(self, population, child, score, parents):
+        if score < population.scores.worst():
+            return population.scores.worst_index()
+        return None
+
+
+class RandomWorseReplacement(Replacement):
+
+    def __init__(self, attempts=5):
+        """ The child replaces a random solution that scores worse than it.  The solutions
+            are drawn at random up to attempts times, and then the worst solution is tried.
+
+        Args:
+            attempts (int):     How many random solutions to try. attempts >= 1
+        """
+
+        # begin contracts on inputs -----------------------------
+
+        if attempts < 1:
+            raise(ValueError)
+
+        # end contracts on inputs -------------------------------
+
+        super().__init__()
+        self.attempts = attempts
+
+
+    def choose(self, population, child, score, parents):
+        for _ in range(self.attempts):
+            idx = random.randint(0, population.pop_size-1)
+            if score < population.scores[idx]:
+                return idx
+
+        if score < population.scores.worst():
+            return population.scores.worst_index()
+        return None
+
+
+class CrowdingReplacement(Replacement):
+    """ The child replaces the parent whose genome is the most similar to it, if it scores
+        better than that parent, so that the niches of the population are kept.  Children
+        with unknown parents fall back to replacing the worst solution. """
+
+    def choose(self, population, child, score, parents):
+        if not parents:
+            return WorstReplacement.choose(self, population, child, score, parents)
+
+        idx = min(parents, key=lambda x: self.distance(child, population.solutions[x]))
+        if score < population.scores[idx]:
+            return idx
+        return None
+
+
+    @staticmethod
+    def distance(a, b):
+        """ Returns the number of operation rows that differ between the solutions """
+        differs = (a.operators != b.operators) | (a.operand_table != b.operand_table).any(axis=1)
+        return int(differs.sum())
+
+
+SELECTIONS = {
+    'random':       RandomSelection,
+    'tournament':   TournamentSelection,
+    'proportional': FitnessProportionalSelection,
+}
+
+REPLACEMENTS = {
+    'worst':        WorstReplacement,
+    'random_worse': RandomWorseReplacement,
+    'crowding':     CrowdingReplacement,
+}
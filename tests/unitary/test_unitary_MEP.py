@@ -1,5 +1,11 @@
 import pytest
 import copy
+import math
+import pickle
+import random
+import numpy as np
+from sklearn.metrics import mean_squared_error, mean_absolute_error
+from formulabot import mep
 from formulabot.mep import Population, Solution
 
 
@@ -48,6 +54,31 @@ def test_Solution_init():
         # make sure the Operator is 0 < x < len(Operator)
         assert o[0] <= len(Solution.Operator)
 
+
+def test_Solution_ops():
+
+    random.seed(6)
+    s = Solution(['X','Y'], 5, 4)
+    other = Solution(['X','Y'], 5, 4)
+    assert s.ops[-1] == s.row(6)
+    assert s.ops[2:] == [s.row(i) for i in range(2, 7)]
+
+    # writing a row or a slice of the ops writes the genome of the solution
+    s.compute({'X': 2., 'Y': 3.})
+    s.ops[-1] = (Solution.Operator.ADD.value, [0, 1, 0, 0])
+    assert s.row(6) == (1, [0, 1, 0, 0])
+    assert s.compute({'X': 2., 'Y': 3.}) == 5.
+
+    s.ops[:4] = other.ops[:4]
+    assert s.ops[:4] == other.ops[:4]
+    assert list(s.operators[:4]) == list(other.operators[:4])
+
+    with pytest.raises(IndexError):
+        s.ops[7] = (1, [0, 1, 2, 0])
+
+    with pytest.raises(ValueError):
+        s.ops[:2] = [('X', [])]
+
 def test_Solution_compute_contracts():
 
     s = Solution(['X','Y','Z'], 10, 10)
@@ -496,4 +527,659 @@ def test_Population_init():
                kill_rate=-0.20,
                error_calc='mae',
                inputs=[],
-               outputs=[100.])
\ No newline at end of file
+               outputs=[100.])
+
+
+def test_Solution_compute_batch():
+
+    X = [{'X': float(x), 'Y': float(y), 'Z': float(x - y)} for x in range(-3, 4) for y in range(-3, 4)]
+    columns = {p: [x[p] for x in X] for p in ['X','Y','Z']}
+
+    # the vectorized results match the row by row results, including division by zero
+    random.seed(1)
+    for _ in range(25):
+        s = Solution(['X','Y','Z'], 10, 4)
+        expected = [s.compute(x) for x in X]
+        assert np.allclose(s.compute_batch(columns), expected, equal_nan=True)
+
+    with pytest.raises(ValueError):
+        s.compute_batch(None)
+
+    with pytest.raises(ValueError):
+        s.compute_batch({'X': [1., 2.]})
+
+    with pytest.raises(ValueError):
+        s.compute_batch({'X': [1., 2.], 'Y': [1., 2.], 'Z': [1.]})
+
+def test_Solution_compile():
+
+    s = Solution(['X','Y','Z'], 5, 4)
+    s.ops = [('X', []),
+            ('Y', []),
+            ('Z', []),
+            (1, [0, 1, 1, 1]),
+            (4, [3, 0, 0, 1]),
+            (10, [2, 3, 4, 0]),
+            (6, [5, 1, 3, 1]),
+            (3, [6, 2, 0, 5])]
+
+    x = {'X':0, 'Y':3, 'Z':7}
+    assert s.compute(x) == 0 * 7
+    assert s.compile() is s.compile()
+
+    # replacing the ops discards the compiled function
+    f = s.compile()
+    s.ops = s.ops[:7] + [(1, [6, 2, 0, 5])]
+    assert s.compile() is not f
+    assert s.compute(x) == 0 + 7
+
+    # mutating the ops discards the compiled function
+    f = s.compile()
+    s.mutate()
+    assert s.compile() is not f
+
+def test_Solution_effective_rows():
+
+    s = Solution(['X','Y','Z'], 5, 4)
+    s.ops = [('X', []),
+            ('Y', []),
+            ('Z', []),
+            (1, [0, 1, 1, 1]),
+            (6, [3, 0, 0, 1]),
+            (10, [2, 3, 4, 0]),
+            (6, [5, 1, 3, 1]),
+            (3, [3, 2, 0, 5])]
+
+    # rows 4, 5 and 6 are never read by the output row
+    assert s.effective_rows() == [0, 1, 2, 3, 7]
+    assert s.to_latex_string() == r"((X+Y)\cdot Z)"
+
+    # the effective program ignores the introns
+    s2 = copy.deepcopy(s)
+    s2.replace_row(5, (1, [0, 1, 2, 3]))
+    assert s2.effective_program() == s.effective_program()
+    assert s2.effective_hash() == s.effective_hash()
+
+    s2.replace_row(7, (3, [3, 6, 0, 5]))
+    assert s2.effective_rows() == [0, 1, 3, 5, 6, 7]
+    assert s2.effective_program() != s.effective_program()
+
+    # the incrementally maintained rows match a full recount after mutation
+    random.seed(2)
+    s = Solution(['X','Y','Z'], 100, 10)
+    for _ in range(500):
+        s.mutate()
+        live = s.effective_rows()
+        s.invalidate()
+        assert s.effective_rows() == live
+
+def test_Solution_output_row():
+
+    s = Solution(['X','Y','Z'], 5, 4)
+    s.ops = [('X', []),
+            ('Y', []),
+            ('Z', []),
+            (1, [0, 1, 1, 1]),
+            (6, [3, 0, 0, 1]),
+            (10, [2, 3, 4, 0]),
+            (6, [5, 1, 3, 1]),
+            (3, [3, 2, 0, 5])]
+
+    x = {'X':1, 'Y':3, 'Z':7}
+    assert s.effective_rows() == [0, 1, 2, 3, 7]
+
+    s.set_output_row(4)
+    assert s.effective_rows() == [0, 1, 3, 4]
+    assert s.compute(x) == -4
+    assert s.compute_batch({'X':[1.], 'Y':[3.], 'Z':[7.]})[0] == -4
+    assert s.to_latex_string() == r"-((X+Y))"
+
+
+def test_Population_multi_expression():
+
+    random.seed(3)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(1, 6) for y in range(1, 6)]
+    Y = [x['X'] * x['Y'] for x in X]
+
+    p = Population(population_size=10, 
+               parameters=['X','Y'], 
+               operations_size=20, 
+               operands_size=4, 
+               epochs=1, 
+               crossover_rate=0.5, 
+               mutation_rate=0.1, 
+               kill_rate=0.1,
+               error_calc=lambda a, b: float(np.mean(np.abs(a - b))),
+               inputs=X, 
+               outputs=Y,
+               multi_expression=True)
+
+    for s, score in zip(p.solutions, p.scores):
+
+        # the score is the best score of any of the rows
+        calc_tape = s.compute_tape(p.columns)
+        for row in range(s.params_size, s.ops_size):
+            assert score <= p.score_predictions(calc_tape[row])
+
+        # and the output row reproduces it
+        assert score == p.score_predictions(s.compute_batch(p.columns))
+
+def test_Population_cache():
+
+    random.seed(4)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(1, 6) for y in range(1, 6)]
+    Y = [x['X'] * x['Y'] for x in X]
+
+    p = Population(population_size=10, 
+               parameters=['X','Y'], 
+               operations_size=10, 
+               operands_size=4, 
+               epochs=5, 
+               crossover_rate=0.5, 
+               mutation_rate=0.5, 
+               kill_rate=0.1,
+               error_calc=lambda a, b: float(np.mean(np.abs(a - b))),
+               inputs=X, 
+               outputs=Y,
+               cache_size=4)
+
+    assert p.cache_misses + p.cache_hits == 10
+    assert len(p.cache) <= 4
+
+    # a copy with a changed intron is scored from the cache
+    s = copy.deepcopy(p.solutions[0])
+    dead = [i for i in range(s.params_size, s.ops_size) if i not in s.effective_rows()]
+    if dead:
+        s.replace_row(dead[0], (1, [0, 1, 0, 1]))
+    p.update_score(0)
+    hits = p.cache_hits
+    assert p.evaluate(s) == p.scores[0]
+    assert p.cache_hits == hits + 1
+
+    p.run_epochs()
+    assert len(p.cache) <= 4
+
+    with pytest.raises(ValueError):
+        Population(population_size=10, parameters=['X','Y'], operations_size=10, operands_size=4, 
+                   epochs=5, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.1,
+                   error_calc=None, inputs=X, outputs=Y, cache_size=-1)
+
+def test_Population_tape_memory():
+
+    random.seed(5)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(1, 6) for y in range(1, 6)]
+    Y = [x['X'] * x['Y'] for x in X]
+
+    p = Population(population_size=10, 
+               parameters=['X','Y'], 
+               operations_size=30, 
+               operands_size=4, 
+               epochs=5, 
+               crossover_rate=0.5, 
+               mutation_rate=0.5, 
+               kill_rate=0.1,
+               error_calc=lambda a, b: float(np.mean(np.abs(a - b))),
+               inputs=X, 
+               outputs=Y,
+               tape_memory=10**6)
+
+    assert len(p.tapes) == 10
+    assert p.tape_bytes <= 10**6
+
+    # after a mutation only the changed rows are recomputed and the score matches
+    # a full evaluation
+    for _ in range(50):
+        s = p.solutions[0]
+        before = list(s._tape)
+        s.mutate()
+        kept = [i for i, t in enumerate(s._tape) if t is not None]
+        score = p.update_score(0)
+        assert all(s._tape[i] is before[i] for i in kept)
+        assert score == p.score_predictions(s.compute_batch(p.columns)) 
+
+    p.run_epochs()
+    assert p.tape_bytes <= 10**6
+    assert set(p.tapes) <= set(id(s) for s in p.solutions)
+
+    # tapes that do not fit the memory are not kept
+    p.tape_memory = 1
+    p.update_scores()
+    assert p.tape_bytes <= 1
+
+def test_Population_genome_store():
+
+    random.seed(6)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(1, 6) for y in range(1, 6)]
+    Y = [x['X'] * x['Y'] for x in X]
+
+    p = Population(population_size=10, 
+               parameters=['X','Y'], 
+               operations_size=10, 
+               operands_size=4, 
+               epochs=5, 
+               crossover_rate=0.5, 
+               mutation_rate=0.5, 
+               kill_rate=0.5,
+               error_calc=lambda a, b: float(np.mean(np.abs(a - b))),
+               inputs=X, 
+               outputs=Y)
+
+    assert p.operators.shape == (10, 12)
+    assert p.operand_tables.shape == (10, 12, 4)
+
+    # every solution is a view of its slot in the store
+    for idx, s in enumerate(p.solutions):
+        assert np.shares_memory(s.operators, p.operators[idx])
+        assert np.shares_memory(s.operand_table, p.operand_tables[idx])
+
+    # a replaced solution keeps its genome
+    old = p.solutions[0]
+    ops = old.ops
+    child = p.solutions[1].copy()
+    p.place(0, child)
+    assert old.ops == ops
+    assert p.solutions[0] is child
+    assert child.compare_operations(p.solutions[1])
+
+    p.run_epochs()
+    for idx, s in enumerate(p.solutions):
+        assert np.shares_memory(s.operators, p.operators[idx])
+        assert p.scores[idx] == p.score_predictions(s.compute_batch(p.columns))
+
+
+def test_Solution_offspring():
+
+    random.seed(4)
+    a = Solution(['X','Y'], 10, 4)
+    b = Solution(['X','Y'], 10, 4)
+    a_ops, b_ops = a.ops, b.ops
+
+    for splice in [0, 5, a.ops_size]:
+        expected = a.copy()
+        expected.crossover(b, splice)
+
+        # the child is written straight from both parents, which are left unchanged
+        child = Solution.offspring(a, b, splice)
+        assert child.compare_operations(expected)
+        assert not np.shares_memory(child.operators, a.operators)
+        assert a.ops == a_ops and b.ops == b_ops
+
+    operators, operand_tables = Solution.allocate(2, a.ops_size, a.operands_size)
+    child = Solution.offspring(a, b, 5, (operators[1], operand_tables[1]))
+    assert np.shares_memory(child.operators, operators)
+    expected = a.copy()
+    expected.crossover(b, 5)
+    assert child.compare_operations(expected)
+
+def test_Population_evaluate_batch(monkeypatch):
+
+    random.seed(7)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+
+    for error_calc in [mean_squared_error, lambda a, b: float(np.max(np.abs(a - b)))]:
+        for multi_expression in [False, True]:
+            p = Population(population_size=20, 
+                    parameters=['X','Y'], 
+                    operations_size=15, 
+                    operands_size=4, 
+                    epochs=5, 
+                    crossover_rate=0.5, 
+                    mutation_rate=0.5, 
+                    kill_rate=0.2,
+                    error_calc=error_calc,
+                    inputs=X, 
+                    outputs=Y,
+                    multi_expression=multi_expression)
+
+            # the batch matches scoring one solution at a time, in one chunk or many
+            expected = [p.evaluate_uncached(s) for s in p.solutions]
+            rows = [s.output_row for s in p.solutions]
+            for memory in [2**24, 2**12]:
+                monkeypatch.setattr(mep, '_BATCH_MEMORY', memory)
+                for s in p.solutions:
+                    s.set_output_row(s.ops_size - 1)
+                assert np.allclose(p.evaluate_batch(p.solutions), expected)
+                assert [s.output_row for s in p.solutions] == rows
+
+            p.run_epochs()
+            assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+
+def test_ErrorMetric():
+
+    y_true = [1., 2., 3., 4.]
+    y_pred = [1.5, 1., 3., 7.]
+    assert np.isclose(mep.mse(y_true, y_pred), mean_squared_error(y_true, y_pred))
+    assert np.isclose(mep.mae(y_true, y_pred), mean_absolute_error(y_true, y_pred))
+
+
+def test_Population_bound(monkeypatch):
+
+    monkeypatch.setattr(mep, '_BOUND_CHUNK', 10)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+
+    for error_calc in [mep.mse, mean_squared_error]:
+        random.seed(6)
+        p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                       epochs=4, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                       error_calc=error_calc, inputs=X, outputs=Y, cache_size=50)
+
+        for s in p.solutions:
+            score = p.evaluate_uncached(s)
+
+            # a solution scoring below the bound gets its full score
+            assert p.evaluate_bounded(s, math.inf) == score
+
+            # and is cut short otherwise
+            if math.isfinite(score):
+                assert p.evaluate_bounded(s, score / 100.) == math.inf
+
+        assert p.early_stops > 0
+
+        # a score that was cut short is not cached
+        s = p.solutions[0]
+        p.clear_cache()
+        assert p.evaluate(s, bound=-1.) == math.inf
+        assert p.evaluate(s) == p.evaluate_uncached(s)
+
+        for _ in range(10):
+            p.crossover_one()
+        assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+
+def test_Population_racing(monkeypatch):
+
+    random.seed(9)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=4, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, racing=0.1)
+
+    # the chunks cover the data once, each as large as all of the chunks before it times 3
+    stages = p.get_race_stages()
+    assert [len(t) for _, _, t in stages] == [12, 36, 73]
+    assert sorted(np.concatenate([idx for idx, _, _ in stages])) == list(range(len(Y)))
+
+    for _ in range(20):
+        p.crossover_one()
+        p.mutate_one()
+
+    stats = p.get_racing_stats()
+    assert stats['candidates'] >= stats['eliminated'] > 0
+    assert stats['saved'] == stats['full_samples'] - stats['samples']
+
+    # eliminated children are rejected and eliminated mutants are reverted, so every
+    # solution has its full score
+    assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+    # mutants are raced by run_epochs too, on data large enough to be scored one at a time
+    random.seed(9)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-10, 11) for y in range(-10, 11)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=3, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, racing=0.1)
+    p.run_epochs(verbose=False)
+
+    assert p.get_racing_stats()['candidates'] > len(p.trace) * p.crossovers
+    assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+    # the race bound is found once for the children and once for the mutants of an epoch
+    calls = []
+    race_bound = p.get_race_bound
+    monkeypatch.setattr(p, 'get_race_bound', lambda: calls.append(1) or race_bound())
+    p.crossover_many()
+    p.mutate_many()
+    assert len(calls) == 2
+
+    with pytest.raises(ValueError):
+        Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=4, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, racing=1.)
+
+
+def test_Population_batch_size(tmp_path):
+
+    random.seed(12)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, cache_size=50)
+
+    # a pass over the shuffled data yields disjoint batches
+    batches = p.get_batches(p.columns, p.targets, 40)
+    rows = [tuple(x) for _ in range(3) for x in np.stack(list(next(batches)[0].values()), axis=1)]
+    assert len(rows) == 120 and len(set(rows)) == 120
+
+    columns = p.columns
+    p.run_epochs(verbose=False, batch_size=30)
+
+    # the population is scored on all of the training data again at the end
+    assert p.columns is columns
+    assert len(p.targets) == len(Y)
+    assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+    # a checkpoint saved on a batch is scored on all of the training data when it is restored
+    path = str(tmp_path / 'run.ckpt')
+    p.run_epochs(verbose=False, epochs=3, batch_size=30, checkpoint=path, checkpoint_every=3)
+    q = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, checkpoint=path)
+    assert np.allclose(q.scores, [q.evaluate_uncached(s) for s in q.solutions])
+
+    with pytest.raises(ValueError):
+        p.run_epochs(verbose=False, batch_size=0)
+
+
+def test_Population_checkpoint(tmp_path):
+
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    path = str(tmp_path / 'run.ckpt')
+
+    def population(checkpoint=None):
+        return Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                          epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                          error_calc=mep.mse, inputs=X, outputs=Y, cache_size=20, checkpoint=checkpoint)
+
+    random.seed(0)
+    p = population()
+    p.run_epochs(verbose=False, epochs=3, checkpoint=path, checkpoint_every=3)
+    saved = list(p.scores)
+    p.run_epochs(verbose=False, epochs=3)
+
+    # a population resumed from the checkpoint ends exactly where the uninterrupted run did
+    random.seed(14)
+    q = population()
+    q.resume(path, verbose=False)
+
+    assert q.epoch == p.epoch == 6
+    assert np.array_equal(q.operators, p.operators)
+    assert np.array_equal(q.operand_tables, p.operand_tables)
+    assert list(q.scores) == list(p.scores)
+    assert np.allclose(q.scores, [q.evaluate_uncached(s) for s in q.solutions])
+
+    # a population created from the checkpoint is restored without scoring any solution
+    r = population(path)
+    assert r.epoch == 3
+    assert list(r.scores) == saved
+    assert r.get_counters()['evaluations'] == 0
+
+    with pytest.raises(ValueError):
+        Population(population_size=20, parameters=['X','Y'], operations_size=10, operands_size=4,
+                   epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y).load_checkpoint(path)
+
+
+def test_Population_pickle(tmp_path):
+
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    path = str(tmp_path / 'run.ckpt')
+
+    random.seed(5)
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, tape_memory=1 << 20)
+
+    # the solutions of an unpickled population are still views of its genome store
+    for q in [pickle.loads(pickle.dumps(p)), copy.deepcopy(p)]:
+        for idx, s in enumerate(q.solutions):
+            assert np.shares_memory(s.operators, q.operators[idx])
+
+        for _ in range(5):
+            q.mutate_many()
+        q.save_checkpoint(path)
+
+        r = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                       epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                       error_calc=mep.mse, inputs=X, outputs=Y, checkpoint=path)
+        assert np.allclose(r.scores, [r.evaluate_uncached(s) for s in r.solutions])
+
+
+def test_Population_profile():
+
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+
+    def population(profile):
+        random.seed(0)
+        return Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                          epochs=4, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                          error_calc=mep.mse, inputs=X, outputs=Y, profile=profile)
+
+    # the 20 initial solutions are counted as evaluations
+    p = population(False)
+    assert p.get_counters()['evaluations'] == 20
+    assert p.get_counters()['rows'] == 20 * len(Y)
+    p.run_epochs(verbose=False)
+    assert p.metrics == []
+
+    seen = []
+    q = population(True)
+    q.add_observer(lambda population, metrics: seen.append(metrics))
+    run = q.run_epochs(verbose=False)
+
+    # profiling does not change the run
+    assert q.trace == p.trace
+    assert seen == q.metrics and len(seen) == run
+
+    counters = q.get_counters()
+    assert counters['evaluations'] == 20 + sum(m['evaluations'] for m in seen)
+    assert counters['rows'] == counters['evaluations'] * len(Y)
+
+    for m in seen:
+        assert set(m['seconds']) == {'crossover', 'mutate', 'kill', 'scoring', 'total'}
+        assert m['seconds']['scoring'] <= m['seconds']['total']
+        assert 0 <= m['child_acceptance'] <= 1 and 0 <= m['mutation_improvement'] <= 1
+        assert m['evals_per_sec'] > 0
+
+
+def test_Solution_simplify():
+
+    s = Solution(['X','Y','Z'], 6, 4)
+    s.ops = [('X', []),
+            ('Y', []),
+            ('Z', []),
+            (6, [0, 0, 0, 0]),
+            (6, [3, 0, 0, 0]),
+            (2, [1, 1, 0, 0]),
+            (1, [4, 5, 0, 0]),
+            (10, [2, 2, 1, 6]),
+            (3, [7, 1, 0, 0])]
+
+    # --X + (Y - Y) is X, and the condition Z > Z never holds
+    x = {'X': 1.5, 'Y': -2., 'Z': 0.3}
+    assert s.to_latex_string(simplify=True) == r"(X\cdot Y)"
+    assert s.compute(x, simplify=True) == s.compute(x) == -3.
+
+    assert s.simplify()
+    assert s.effective_rows() == [0, 1, 8]
+    assert s.compute(x) == -3.
+    assert not s.simplify()
+
+    # a program that simplifies to an input keeps an operator row as its output
+    s.replace_row(8, (11, [1, 1, 7, 0]))
+    assert s.simplify()
+    assert s.effective_rows() == [0, 8]
+    assert s.compute(x) == 1.5
+
+    # simplified programs compute the same results
+    random.seed(5)
+    columns = {'X': np.linspace(-3, 3, 50), 'Y': np.linspace(4, -2, 50), 'Z': np.cos(np.arange(50))}
+    for _ in range(200):
+        s = Solution(['X','Y','Z'], 20, 4)
+        simplified = s.simplified()
+        assert len(simplified.effective_rows()) <= len(s.effective_rows())
+        assert np.allclose(simplified.compute_batch(columns), s.compute_batch(columns), equal_nan=True)
+
+
+def test_Population_simplify():
+
+    random.seed(6)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=4, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y, cache_size=20)
+
+    rows = sum(len(s.effective_rows()) for s in p.solutions)
+    p.simplify_solutions()
+    assert sum(len(s.effective_rows()) for s in p.solutions) <= rows
+    assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+    p.run_epochs(verbose=False, simplify_every=2)
+    assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+    with pytest.raises(ValueError):
+        p.run_epochs(verbose=False, simplify_every=0)
+
+
+def test_Population_linear_scaling(tmp_path):
+
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [3. * x['X'] * x['Y'] + 2. for x in X]
+
+    def population(**kwargs):
+        random.seed(9)
+        return Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                          epochs=3, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                          error_calc=mep.mse, inputs=X, outputs=Y, linear_scaling=True, **kwargs)
+
+    p = population(cache_size=20)
+
+    # X * Y scaled by (2, 3) fits the data exactly
+    s = Solution(['X','Y'], 3, 4)
+    s.ops = [('X', []), ('Y', []), (1, [0, 1, 0, 0]), (2, [0, 0, 0, 0]), (3, [0, 1, 0, 0])]
+    assert p.evaluate(s) == pytest.approx(0., abs=1e-20)
+    assert s.scaling == pytest.approx((2., 3.))
+    assert s.compute({'X': 2., 'Y': 5.}) == pytest.approx(32.)
+    assert s.compute_batch(p.columns) == pytest.approx(Y)
+    assert s.to_latex_string() == r"(3\cdot (X\cdot Y)+2)"
+
+    # a cached score restores the scaling of the solution
+    s2 = s.copy()
+    s2.set_scaling(None)
+    assert p.evaluate(s2) == p.evaluate(s) and s2.scaling == s.scaling
+
+    # a solution that is the same for every sample is scaled to the mean of the targets
+    s.replace_row(4, (2, [0, 0, 0, 0]))
+    assert p.evaluate(s) == pytest.approx(np.var(Y))
+    assert s.scaling == pytest.approx((np.mean(Y), 0.))
+
+    # the batch engine scales and scores like the scoring of a single solution
+    scalings = [s.scaling for s in p.solutions]
+    assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+    assert [s.scaling for s in p.solutions] == scalings
+
+    # the scalings are restored with the checkpoint of a population
+    path = str(tmp_path / 'run.ckpt')
+    p.run_epochs(verbose=False, checkpoint=path, checkpoint_every=3)
+    q = population()
+    q.load_checkpoint(path)
+    assert [s.scaling for s in q.solutions] == [s.scaling for s in p.solutions]
+    assert q.get_best_solution().compute_batch(q.columns) == pytest.approx(p.get_best_solution().compute_batch(p.columns))
@@ -0,0 +1,52 @@
+import pytest
+from formulabot import benchmarks
+
+
+def write_data(tmp_path):
+    with open(tmp_path / 'product.csv', 'w') as f:
+        f.write('X,Y,out\n')
+        for x in range(-5, 6):
+            for y in range(-5, 6):
+                f.write('{},{},{}\n'.format(x, y, x * y + y))
+
+
+def test_load_dataset(tmp_path):
+
+    write_data(tmp_path)
+    data = benchmarks.load_dataset(str(tmp_path), 'product')
+    scaled = benchmarks.load_dataset(str(tmp_path), 'product', 3)
+
+    assert len(scaled) == 3 * len(data)
+    assert (scaled.targets[:len(data)] == data.targets).all()
+
+    with pytest.raises(ValueError):
+        benchmarks.load_dataset(str(tmp_path), 'product', 0)
+
+
+def test_suite_and_compare(tmp_path):
+
+    write_data(tmp_path)
+    results = benchmarks.run_suite(str(tmp_path), ['product'], benchmarks=['update_scores', 'kill_many'],
+                                   repeats=1, max_epochs=3)
+    result = results['results']['productx1']
+
+    assert set(result) == {'update_scores', 'kill_many', 'time_to_target'}
+    assert result['update_scores']['evals_per_sec'] > 0
+    assert result['time_to_target']['epochs'] <= 3
+
+    assert benchmarks.compare(results, results) == []
+
+    faster = {'results': {'productx1': {'update_scores': {'evals_per_sec': 2 * result['update_scores']['evals_per_sec']}}}}
+    regressions = benchmarks.compare(results, faster)
+    assert len(regressions) == 1 and 'update_scores' in regressions[0]
+
+    with pytest.raises(ValueError):
+        benchmarks.time_benchmark(None, 'unknown')
+
+
+def test_time_import():
+
+    # the engine imports without its optional plotting and progress dependencies
+    result = benchmarks.time_import(repeats=1)
+    assert result['seconds'] > 0
+    assert result['loaded'] == []
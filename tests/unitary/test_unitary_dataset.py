@@ -0,0 +1,87 @@
+import os
+import pickle
+import random
+import pytest
+import numpy as np
+from formulabot import mep
+from formulabot.mep import Population
+from formulabot.dataset import Dataset
+
+
+def write_csv(path):
+    with open(path, 'w') as f:
+        f.write('X,Y,out\n')
+        for x in range(-5, 6):
+            for y in range(-5, 6):
+                f.write('{},{},{}\n'.format(x, y, x * y + y))
+
+
+def test_Dataset_from_csv(tmp_path):
+
+    path = str(tmp_path / 'data.csv')
+    write_csv(path)
+
+    d = Dataset.from_csv(path)
+    assert os.path.exists(path + '.cache.npy')
+    assert d.names == ['X', 'Y', 'out']
+    assert d.parameters == ['X', 'Y']
+    assert len(d) == 121
+    assert d[0] == {'X': -5., 'Y': -5.}
+    assert d.targets[0] == 20.
+
+    # every column is a contiguous array mapped from the cache
+    for v in d.columns.values():
+        assert v.flags['C_CONTIGUOUS']
+
+    # a second load maps the cache and a pickled dataset is mapped again
+    assert Dataset.from_csv(path).path == d.path
+    clone = pickle.loads(pickle.dumps(d))
+    assert len(pickle.dumps(d)) < 1000
+    assert np.array_equal(clone.targets, d.targets)
+
+
+def test_Population_dataset(tmp_path):
+
+    path = str(tmp_path / 'data.csv')
+    write_csv(path)
+    d = Dataset.from_csv(path)
+
+    random.seed(1)
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=2, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=d)
+
+    random.seed(1)
+    q = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=2, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=list(d), outputs=list(d.targets))
+
+    # the population is scored on the mapped columns without copying them
+    assert p.columns['X'] is d.columns['X']
+    assert p.get_mapped_dataset() is d
+    assert list(p.scores) == list(q.scores)
+
+    # the rows of the dataset are the inputs of a solution
+    s = p.get_best_solution()
+    assert np.allclose([s.compute(x) for x in d], s.compute_batch(d.get_columns(p.parameters)))
+
+    with pytest.raises(ValueError):
+        Population(population_size=20, parameters=['X','Z'], operations_size=15, operands_size=4,
+                   epochs=2, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=d)
+
+
+def test_Population_dataset_n_jobs(tmp_path):
+
+    path = str(tmp_path / 'data.csv')
+    write_csv(path)
+
+    random.seed(2)
+    with Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                    epochs=2, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                    error_calc=mep.mse, inputs=Dataset.from_csv(path), n_jobs=2) as p:
+
+        # the workers map the dataset instead of copying it into shared memory
+        assert p.get_pool().data is None
+        p.run_epochs(verbose=False)
+        assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
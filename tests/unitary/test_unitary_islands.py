@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+from sklearn.metrics import mean_squared_error
+from formulabot.islands import Archipelago
+
+
+def get_kwargs():
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    return dict(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                epochs=6, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                error_calc=mean_squared_error, inputs=X, outputs=Y)
+
+
+def test_Archipelago():
+
+    kwargs = get_kwargs()
+
+    for topology in Archipelago.TOPOLOGIES:
+        with Archipelago(islands=3, migration_interval=2, migrants=2, topology=topology, seed=3, **kwargs) as a:
+            run = a.run_epochs(verbose=False)
+            assert 1 <= run <= kwargs['epochs']
+
+            # the best solution is rebuilt in the parent process and scores as reported
+            s = a.get_best_solution()
+            predictions = [s.compute(x) for x in kwargs['inputs']]
+            assert np.isclose(mean_squared_error(kwargs['outputs'], predictions), a.get_best_score())
+            assert isinstance(s.to_latex_string(), str)
+
+        assert a.processes == []
+
+
+def test_Archipelago_contracts():
+
+    kwargs = get_kwargs()
+
+    with pytest.raises(ValueError):
+        Archipelago(islands=0, migration_interval=2, **kwargs)
+
+    with pytest.raises(ValueError):
+        Archipelago(islands=2, migration_interval=0, **kwargs)
+
+    with pytest.raises(ValueError):
+        Archipelago(islands=2, migration_interval=2, migrants=-1, **kwargs)
+
+    with pytest.raises(ValueError):
+        Archipelago(islands=2, migration_interval=2, topology='star', **kwargs)
+
+    with pytest.raises(ValueError):
+        Archipelago(islands=2, migration_interval=2, **dict(kwargs, n_jobs=2))
+
+    # an island that fails to build its population sends its error back
+    with pytest.raises(ValueError):
+        Archipelago(islands=2, migration_interval=2, **dict(kwargs, population_size=5))
+
+    with pytest.raises(TypeError):
+        Archipelago(islands=2, migration_interval=2, **dict(kwargs, unknown=1))
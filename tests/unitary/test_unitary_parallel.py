@@ -0,0 +1,70 @@
+import gc
+import pytest
+import random
+import numpy as np
+from sklearn.metrics import mean_squared_error
+from multiprocessing import shared_memory
+from formulabot.mep import Population
+
+
+def test_Population_n_jobs():
+
+    random.seed(8)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+
+    for multi_expression, linear_scaling in [(False, False), (True, False), (True, True)]:
+        with Population(population_size=20, 
+                        parameters=['X','Y'], 
+                        operations_size=15, 
+                        operands_size=4, 
+                        epochs=3, 
+                        crossover_rate=0.5, 
+                        mutation_rate=0.5, 
+                        kill_rate=0.2,
+                        error_calc=mean_squared_error,
+                        inputs=X, 
+                        outputs=Y,
+                        multi_expression=multi_expression,
+                        linear_scaling=linear_scaling,
+                        n_jobs=2) as p:
+
+            # the workers score and scale the same as the parent process
+            assert p.pool is not None
+            scalings = [s.scaling for s in p.solutions]
+            assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+            assert [s.scaling for s in p.solutions] == scalings
+
+            p.run_epochs()
+            assert np.allclose(p.scores, [p.evaluate_uncached(s) for s in p.solutions])
+
+        assert p.pool is None
+
+
+def test_Population_n_jobs_contracts():
+
+    with pytest.raises(ValueError):
+        Population(population_size=10, parameters=['X'], operations_size=10, operands_size=4, 
+                   epochs=5, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.1,
+                   error_calc=mean_squared_error, inputs=[{'X': 1.}], outputs=[1.], n_jobs=0)
+
+
+def test_EvaluationPool_dropped():
+
+    X = [{'X': float(x)} for x in range(-5, 6)]
+    Y = [x['X'] * 2. for x in X]
+    p = Population(population_size=10, parameters=['X'], operations_size=5, operands_size=4,
+                   epochs=1, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.1,
+                   error_calc=mean_squared_error, inputs=X, outputs=Y, n_jobs=2)
+    name = p.pool.data.shm.name
+    executor = p.pool.executor
+
+    # a population dropped without being closed releases its workers and shared memory
+    del p
+    gc.collect()
+
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
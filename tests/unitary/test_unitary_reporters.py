@@ -0,0 +1,45 @@
+import random
+from formulabot import mep
+from formulabot.mep import Population
+from formulabot.reporters import Reporter, ProgressBar, NotebookPlot, get_reporters
+
+
+class Recorder(Reporter):
+
+    def __init__(self):
+        self.calls = []
+
+    def start(self, population, epochs):
+        self.calls.append(('start', epochs))
+
+    def update(self, population):
+        self.calls.append(('update', population.epoch))
+
+    def finish(self, population):
+        self.calls.append(('finish', population.epoch))
+
+
+def test_get_reporters():
+
+    assert get_reporters(verbose=False) == []
+    assert [type(r) for r in get_reporters(plot_nb=True)] == [NotebookPlot, ProgressBar]
+
+    r = Recorder()
+    assert get_reporters(verbose=False, reporters=[r]) == [r]
+
+
+def test_run_epochs_reporters():
+
+    random.seed(0)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    p = Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                   epochs=3, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                   error_calc=mep.mse, inputs=X, outputs=Y)
+
+    r = Recorder()
+    run = p.run_epochs(verbose=False, reporters=[r])
+
+    assert r.calls[0] == ('start', 3)
+    assert r.calls[1:-1] == [('update', e) for e in range(1, run + 1)]
+    assert r.calls[-1] == ('finish', run)
@@ -0,0 +1,56 @@
+import csv
+import pytest
+from formulabot.results import ResultsSink, COLUMNS
+
+
+def get_result(i):
+    return {'scenario': 's{}'.format(i), 'population_size': 100, 'operations_size': 10, 'operands_size': 30,
+            'epochs': 400, 'crossover_rate': 0.2, 'mutation_rate': 0.1, 'kill_rate': 0.1,
+            'train_score': 1.5, 'test_score': 2.5, 'train_rows': list(range(8)), 'test_rows': list(range(4)),
+            'latex_string': '\\frac{A, "B"}{2}', 'calc_time': 0.5, 'trace': [(1, 3., 4.), (2, 1.5, 3.)]}
+
+
+def test_ResultsSink(tmp_path):
+
+    path = str(tmp_path / 'results.csv')
+    traces = str(tmp_path / 'traces.csv')
+
+    for _ in range(2):
+        with ResultsSink(path, traces, batch_size=2) as sink:
+            for i in range(3):
+                sink.write(get_result(i))
+
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+
+    # one header, and the latex strings survive their commas and quotes
+    names = [name for name, _, _ in COLUMNS]
+    assert rows[0] == names
+    assert len(rows) == 7
+    assert rows[1][names.index('scenario')] == 's0'
+    assert rows[1][names.index('latex_string')] == '\\frac{A, "B"}{2}'
+    assert rows[1][names.index('train_size')] == '8'
+
+    with open(traces, newline='') as f:
+        rows = list(csv.reader(f))
+
+    assert rows[0] == ['scenario', 'epoch', 'best_score', 'avg_score']
+    assert rows[1:3] == [['s0', '1', '3.0', '4.0'], ['s0', '2', '1.5', '3.0']]
+    assert len(rows) == 13
+
+
+def test_ResultsSink_parquet(tmp_path):
+
+    try:
+        import pyarrow
+    except ImportError:
+        with pytest.raises(ImportError):
+            ResultsSink(str(tmp_path / 'results.csv'), parquet_path=str(tmp_path / 'results.parquet'))
+        return
+
+    import pyarrow.parquet
+    with ResultsSink(str(tmp_path / 'results.csv'), parquet_path=str(tmp_path / 'results.parquet')) as sink:
+        sink.write(get_result(0))
+
+    table = pyarrow.parquet.read_table(str(tmp_path / 'results.parquet'))
+    assert table.column('train_score').to_pylist() == [1.5]
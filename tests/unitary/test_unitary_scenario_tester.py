@@ -0,0 +1,44 @@
+import random
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from formulabot import scenario_tester
+from formulabot.dataset import Dataset
+
+
+def test_sample_configuration():
+
+    random.seed(3)
+    for _ in range(20):
+        d = scenario_tester.sample_configuration()
+        for k, (low, high) in scenario_tester.PARAMETER_RANGES.items():
+            value = d[k] * 100 if k in scenario_tester.RATES else d[k]
+            assert low <= round(value) <= high
+
+
+def test_successive_halving(tmp_path):
+
+    random.seed(4)
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    data = Dataset.from_records(X, Y)
+
+    configurations = []
+    for _ in range(4):
+        d = {'parms': data.parameters, 'data': data, 'train_rows': np.arange(80), 'test_rows': np.arange(80, 121),
+             'population_size': 10, 'operations_size': random.randint(5, 15), 'operands_size': 4, 'epochs': 10,
+             'crossover_rate': 0.5, 'mutation_rate': 0.2, 'kill_rate': 0.1}
+        configurations.append(d)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        winner = scenario_tester.successive_halving(configurations, executor, min_epochs=2, keep=0.5,
+                                                    checkpoint_dir=str(tmp_path))
+
+    # 4 scenarios run 2 epochs, 2 of them 4 more and the winner up to the rest of its 10 epochs
+    assert len(list(tmp_path.iterdir())) == 4
+    assert winner['epochs_run'] <= 10
+
+    epochs_run = winner['epochs_run']
+    d = scenario_tester.finish_scenario(winner)
+    assert d['train_score'] == winner['train_score']
+    assert d['epochs'] == epochs_run
+    assert isinstance(d['latex_string'], str)
@@ -0,0 +1,50 @@
+import math
+import random
+import numpy as np
+from formulabot.scores import ScoreIndex
+
+
+def test_ScoreIndex():
+
+    random.seed(11)
+    scores = [float(random.randint(0, 9)) for _ in range(30)]
+    index = ScoreIndex(scores)
+
+    for _ in range(500):
+        idx = random.randint(0, len(scores) - 1)
+        score = random.choice([float(random.randint(0, 9)), math.inf])
+        scores[idx] = score
+        index[idx] = score
+
+        # the index agrees with scanning the list
+        assert list(index) == scores
+        assert index.best() == min(scores)
+        assert index.worst() == max(scores)
+        assert index.best_index() == scores.index(min(scores))
+        assert index.worst_index() == scores.index(max(scores))
+        assert index.distinct() == len(set(scores))
+        assert index.mean() == sum(scores) / len(scores) or np.isclose(index.mean(), sum(scores) / len(scores))
+        assert [scores[x] for x in index.smallest(3)] == sorted(scores)[:3]
+
+
+def test_ScoreIndex_mean():
+
+    # a large score that enters and leaves the index does not swallow the others
+    index = ScoreIndex([1.] * 20)
+    index[0] = 1e20
+    assert index.mean() == 1e20 / 20
+    index[0] = 0.5
+    assert index.mean() == 0.975
+
+    index[3] = math.inf
+    assert index.mean() == math.inf
+    index[3] = 1.
+    assert index.mean() == 0.975
+
+
+def test_ScoreIndex_nan():
+
+    index = ScoreIndex([1., float('nan'), 0.])
+    assert index[1] == math.inf
+    assert index.worst_index() == 1
+    assert index.best_index() == 2
@@ -0,0 +1,70 @@
+import pytest
+import random
+import numpy as np
+from sklearn.metrics import mean_squared_error
+from formulabot.mep import Population
+from formulabot import selection
+
+
+def get_population(**kwargs):
+    X = [{'X': float(x), 'Y': float(y)} for x in range(-5, 6) for y in range(-5, 6)]
+    Y = [x['X'] * x['Y'] + x['Y'] for x in X]
+    return Population(population_size=20, parameters=['X','Y'], operations_size=15, operands_size=4,
+                      epochs=4, crossover_rate=0.5, mutation_rate=0.5, kill_rate=0.2,
+                      error_calc=mean_squared_error, inputs=X, outputs=Y, **kwargs)
+
+
+def test_Population_strategies():
+
+    random.seed(5)
+
+    for s in selection.SELECTIONS:
+        for r in selection.REPLACEMENTS:
+            p = get_population(selection=s, replacement=r)
+            best = p.get_best_score()
+            p.run_epochs(verbose=False)
+
+            # the strategies never lose the best solution and the scores stay in place
+            assert p.get_best_score() <= best
+            assert np.allclose(p.scores, [p.evaluate_uncached(x) for x in p.solutions])
+
+            costs = p.get_strategy_costs()
+            assert costs['selection']['calls'] > 0
+            assert costs['replacement']['calls'] > 0
+            assert costs['replacement']['replaced'] <= costs['replacement']['calls']
+
+
+def test_TournamentSelection():
+
+    random.seed(2)
+    p = get_population()
+
+    # a tournament over the whole population almost always picks the best solution
+    parents = selection.TournamentSelection(size=200).select(p, 10)
+    assert all(p.scores[x] == p.get_best_score() for x in parents)
+
+
+def test_CrowdingReplacement():
+
+    random.seed(3)
+    p = get_population()
+    r = selection.CrowdingReplacement()
+
+    child = p.solutions[4].copy()
+    assert r.distance(child, p.solutions[4]) == 0
+
+    # the child can only replace the parent it is most similar to
+    assert r.target(p, child, -1., [4, 7]) == 4
+    assert r.target(p, child, np.inf, [4, 7]) is None
+
+
+def test_Population_strategies_contracts():
+
+    with pytest.raises(ValueError):
+        get_population(selection='roulette')
+
+    with pytest.raises(ValueError):
+        get_population(replacement='oldest')
+
+    with pytest.raises(ValueError):
+        selection.TournamentSelection(size=0)